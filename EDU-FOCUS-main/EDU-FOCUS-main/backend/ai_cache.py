@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so trivially reformatted prompts share a cache entry"""
+    return ' '.join(prompt.split())
+
+def make_key(model, prompt, max_tokens, temperature):
+    """Content address of a completion request"""
+    payload = json.dumps([model, normalize_prompt(prompt), max_tokens, temperature])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """Two-tier cache for AI completions.
+    
+    A bounded in-process LRU sits in front of a SQLite file that survives
+    restarts and is shared by every worker. SQLite rows expire after
+    AI_CACHE_TTL and the least recently used rows are evicted once the stored
+    responses exceed AI_CACHE_MAX_BYTES.
+    """
+    
+    def __init__(self, app=None):
+        self.enabled = False
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.enabled = app.config['AI_CACHE_ENABLED']
+        self.path = app.config['AI_CACHE_PATH'] or os.path.join(app.instance_path, 'ai_cache.db')
+        self.memory_entries = app.config['AI_CACHE_MEMORY_ENTRIES']
+        self.max_bytes = app.config['AI_CACHE_MAX_BYTES']
+        self.ttl = app.config['AI_CACHE_TTL']
+        if isinstance(self.ttl, timedelta):
+            self.ttl = self.ttl.total_seconds()
+        self.evict_every = app.config['AI_CACHE_EVICT_EVERY']
+        
+        if self.enabled:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)')
+        
+        app.extensions['ai_cache'] = self
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _remember(self, key, value, created_at):
+        with self._lock:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+    
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        if not self.enabled:
+            return None
+        
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now - self.ttl:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return entry[0]
+        
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT response, created_at FROM responses WHERE key = ? AND created_at > ?',
+                (key, now - self.ttl)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        
+        if row is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+        
+        with self._lock:
+            self.stats['disk_hits'] += 1
+        self._remember(key, row[0], row[1])
+        return row[0]
+    
+    def set(self, key, value):
+        """Store a response in both tiers"""
+        if not self.enabled:
+            return
+        
+        now = time.time()
+        self._remember(key, value, now)
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+        
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+    
+    def evict(self):
+        """Drop expired rows, then least recently used rows until under max_bytes"""
+        now = time.time()
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM responses WHERE created_at <= ?', (now - self.ttl,)).rowcount
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                doomed = []
+                for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                    doomed.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany('DELETE FROM responses WHERE key = ?', doomed)
+                removed += len(doomed)
+        
+        with self._lock:
+            self.stats['evictions'] += removed
+        return removed
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats, memory_entries=len(self._memory))
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+response_cache = ResponseCache()
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor, CancelledError, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
+from collections import defaultdict, deque
+import threading
+
+class GatewayError(Exception):
+    """An AI call was rejected or timed out; carries the HTTP status to return"""
+    
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class AIGateway:
+    """Single choke point for upstream AI calls.
+    
+    Calls run on a bounded thread pool. Admission is capped globally (running
+    plus queued) and per user, and a call that would exceed either cap is
+    rejected at once (503 / 429 with Retry-After) instead of tying up another
+    web worker. An admitted call that gets no pool worker within the admission
+    wait is dropped with 503 too; only a running call waits for the upstream
+    timeout. Calls with the same key that are already in flight share one
+    upstream request.
+    """
+    
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._per_user = defaultdict(int)
+        self._active = 0
+        self._executor = None
+        self.stats = {'submitted': 0, 'coalesced': 0, 'rejected': 0, 'queue_timeouts': 0, 'timeouts': 0}
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        workers = app.config['AI_GATEWAY_WORKERS']
+        self.max_active = workers + app.config['AI_GATEWAY_QUEUE_SIZE']
+        self.max_per_user = app.config['AI_GATEWAY_PER_USER']
+        self.admission_wait = app.config['AI_GATEWAY_ADMISSION_WAIT']
+        self.timeout = app.config['AI_GATEWAY_TIMEOUT']
+        self.retry_after = app.config['AI_GATEWAY_RETRY_AFTER']
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-gateway')
+        app.extensions['ai_gateway'] = self
+    
+    def _admit(self, user_id):
+        # Caller holds self._lock
+        if self._active >= self.max_active:
+            self.stats['rejected'] += 1
+            raise GatewayError('AI service is busy, try again shortly', 503, self.retry_after)
+        if self._per_user[user_id] >= self.max_per_user:
+            self.stats['rejected'] += 1
+            raise GatewayError('Too many AI requests in progress', 429, self.retry_after)
+        self._active += 1
+        self._per_user[user_id] += 1
+    
+    def release(self, user_id, key=None):
+        with self._lock:
+            self._active -= 1
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+            if key is not None:
+                self._in_flight.pop(key, None)
+    
+    def submit(self, user_id, key, fn, *args, **kwargs):
+        """Schedule fn and return its Future, joining an in-flight call with the same key.
+        
+        key=None disables coalescing (e.g. chat, where history makes calls unique).
+        The Future's `started` event is set once a pool worker picks the call up.
+        """
+        started = threading.Event()
+        
+        def run():
+            started.set()
+            return fn(*args, **kwargs)
+        
+        with self._lock:
+            if key is not None and key in self._in_flight:
+                self.stats['coalesced'] += 1
+                return self._in_flight[key]
+            
+            self._admit(user_id)
+            self.stats['submitted'] += 1
+            try:
+                future = self._executor.submit(run)
+            except Exception:
+                self._active -= 1
+                self._per_user[user_id] -= 1
+                raise
+            future.started = started
+            if key is not None:
+                self._in_flight[key] = future
+        
+        future.add_done_callback(lambda _: self.release(user_id, key))
+        return future
+    
+    def call(self, user_id, key, fn, *args, **kwargs):
+        """Run fn through the gateway and wait for its result.
+        
+        Raises a 503 GatewayError if no pool worker starts the call within
+        admission_wait, and a 504 if it then runs longer than timeout.
+        """
+        future = self.submit(user_id, key, fn, *args, **kwargs)
+        if not future.started.wait(self.admission_wait) and future.cancel():
+            with self._lock:
+                self.stats['queue_timeouts'] += 1
+            raise GatewayError('AI service is busy, try again shortly', 503, self.retry_after)
+        try:
+            return future.result(timeout=self.timeout)
+        except CancelledError:
+            # Joined a coalesced call that its first caller gave up on while it was queued
+            raise GatewayError('AI service is busy, try again shortly', 503, self.retry_after)
+        except FutureTimeout:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise GatewayError('AI request timed out', 504)
+    
+    def map(self, user_id, fn, arg_list, parallelism):
+        """Run fn(*args) for each args in arg_list, at most parallelism at a time.
+        
+        The batch is admitted once, like a single call, so one large document
+        takes one of the user's slots; parallelism bounds how many pool
+        workers it can occupy. Every task in the pool also holds a global
+        slot, and when none are free the batch runs fewer tasks at once
+        instead of failing. Returns results in input order.
+        """
+        self.acquire(user_id)
+        held = 1  # global slots; the one from admission is kept until the batch ends
+        try:
+            results = [None] * len(arg_list)
+            pending = {}
+            queue = deque(enumerate(arg_list))
+            
+            def fill():
+                # Hold one global slot per task in the pool, and never fewer than one
+                nonlocal held
+                while queue and len(pending) < parallelism:
+                    if len(pending) >= held:
+                        with self._lock:
+                            if self._active >= self.max_active:
+                                break
+                            self._active += 1
+                            self.stats['submitted'] += 1
+                        held += 1
+                    index, args = queue.popleft()
+                    pending[self._executor.submit(fn, *args)] = index
+                surplus = held - max(len(pending), 1)
+                if surplus > 0:
+                    with self._lock:
+                        self._active -= surplus
+                    held -= surplus
+            
+            fill()
+            while pending:
+                done, _ = wait(pending, timeout=self.timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    for future in pending:
+                        future.cancel()
+                    with self._lock:
+                        self.stats['timeouts'] += 1
+                    raise GatewayError('AI request timed out', 504)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                fill()
+            return results
+        finally:
+            with self._lock:
+                self._active -= held - 1
+            self.release(user_id)
+    
+    def acquire(self, user_id):
+        """Take a slot for work that runs in the caller's thread (streaming).
+        
+        Raises GatewayError like submit(); the caller must release(user_id).
+        """
+        with self._lock:
+            self._admit(user_id)
+            self.stats['submitted'] += 1
+    
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, active=self._active, in_flight_keys=len(self._in_flight),
+                        max_active=self.max_active, max_per_user=self.max_per_user)
+
+ai_gateway = AIGateway()
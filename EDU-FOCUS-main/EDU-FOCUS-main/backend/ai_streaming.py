@@ -0,0 +1,90 @@
+import json
+import time
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for when the API reports no usage"""
+    return max(1, len(text) // 4) if text else 0
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event"""
+    lines = []
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def _field(obj, name):
+    # Stream chunks are dicts from the legacy SDK and objects from the v1 SDK
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+def _delta_text(chunk):
+    choices = _field(chunk, 'choices')
+    if not choices:
+        return ''
+    delta = _field(choices[0], 'delta')
+    return (_field(delta, 'content') if delta else None) or ''
+
+def _usage(reported, messages, reply):
+    if reported:
+        return {
+            'prompt_tokens': _field(reported, 'prompt_tokens'),
+            'completion_tokens': _field(reported, 'completion_tokens'),
+            'total_tokens': _field(reported, 'total_tokens'),
+            'estimated': False
+        }
+    prompt_tokens = sum(estimate_tokens(m['content']) for m in messages)
+    completion_tokens = estimate_tokens(reply)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+        'estimated': True
+    }
+
+def relay_completion(chunks, messages, on_complete=None):
+    """Relay a streamed chat completion as SSE.
+    
+    Emits one data event per content delta, then a `done` event with the full
+    reply and token usage. Usage comes from the stream when the API includes
+    it and is estimated otherwise. An `error` event ends the stream if the
+    upstream call fails part-way.
+    
+    on_complete(reply, usage, interrupted) always runs once the stream is
+    started, before the `done` event; interrupted is True when the upstream
+    call failed or the client disconnected, and reply then holds what was
+    streamed so far.
+    """
+    parts = []
+    reported = None
+    interrupted = True
+    try:
+        try:
+            for chunk in chunks:
+                text = _delta_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield sse_event({'delta': text})
+                if _field(chunk, 'usage'):
+                    reported = _field(chunk, 'usage')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+            return
+        interrupted = False
+    finally:
+        # Also runs on GeneratorExit, so tokens streamed to a client that left are still counted
+        reply = ''.join(parts)
+        usage = _usage(reported, messages, reply)
+        if on_complete:
+            on_complete(reply, usage, interrupted)
+    
+    yield sse_event({'reply': reply, 'usage': usage}, event='done')
+
+def fake_completion_stream(reply, delay=0.0, chunk_size=4):
+    """Local stand-in for a streamed completion, yielding legacy-SDK style chunks"""
+    for start in range(0, len(reply), chunk_size):
+        if delay:
+            time.sleep(delay)
+        yield {'choices': [{'delta': {'content': reply[start:start + chunk_size]}}]}
+    yield {'choices': [{'delta': {}, 'finish_reason': 'stop'}]}
@@ -0,0 +1,323 @@
+"""Study analytics kept as rollups that are updated on write.
+
+Routes that change study sessions, quiz scores or pomodoro stats call the
+track_* helpers inside their own transaction. Each helper applies deltas to
+DailyStats / SubjectStats with one upsert per statement and keeps the
+StudyStreak row current, so summary() reads only the days it returns.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import time
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, DailyStats, SubjectStats, StudyStreak, StudySession, Quiz, PomodoroStats, PomodoroEvent
+
+SESSION_COUNTERS = ('planned_sessions', 'completed_sessions', 'study_minutes')
+MAX_DAYS = 366
+EVENT_BATCH = 500  # ids per INSERT, three bound parameters each
+_pruned_at = float('-inf')
+
+def increment_rows(model, keys, rows):
+    """INSERT ... ON CONFLICT (keys) DO UPDATE adding every other value to the stored one.
+
+    All rows must carry the same columns; the statement runs as one executemany.
+    """
+    if not rows:
+        return
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    table = model.__table__
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c[key] for key in keys],
+        set_={
+            name: func.coalesce(table.c[name], 0) + stmt.excluded[name]
+            for name in rows[0] if name not in keys
+        }
+    )
+    db.session.execute(stmt, rows)
+
+def claim_events(user_id, event_ids):
+    """Record client event ids and return the ones not applied before.
+    
+    Offline clients resend their queue until it is acknowledged, possibly from
+    several tabs at once; the unique (user_id, event_id) key lets only the first
+    copy of each event through. Each batch of ids is one
+    INSERT ... ON CONFLICT DO NOTHING RETURNING (SQLite 3.35+ or PostgreSQL).
+    """
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    table = PomodoroEvent.__table__
+    now = datetime.utcnow()
+    event_ids = list(dict.fromkeys(event_ids))
+    fresh = set()
+    for start in range(0, len(event_ids), EVENT_BATCH):
+        rows = [{'user_id': int(user_id), 'event_id': event_id, 'created_at': now}
+                for event_id in event_ids[start:start + EVENT_BATCH]]
+        stmt = dialect.insert(table).values(rows).on_conflict_do_nothing(
+            index_elements=[table.c.user_id, table.c.event_id]
+        ).returning(table.c.event_id)
+        fresh.update(db.session.scalars(stmt))
+    return fresh
+
+def prune_events(retention, interval):
+    """Forget event ids older than retention, at most once per interval seconds per process.
+    
+    The DELETE is a range scan on ix_pomodoro_events_created; running it on
+    every sync would repeat that scan for each request.
+    """
+    global _pruned_at
+    if time.monotonic() - _pruned_at < interval:
+        return
+    _pruned_at = time.monotonic()
+    PomodoroEvent.query.filter(PomodoroEvent.created_at < datetime.utcnow() - retention).delete(synchronize_session=False)
+
+def _active():
+    return or_(
+        DailyStats.focus_time > 0,
+        DailyStats.pomodoro_sessions > 0,
+        DailyStats.completed_sessions > 0,
+        DailyStats.quiz_attempts > 0
+    )
+
+def _recompute_streak(streak):
+    """Walk active days backwards from the most recent one until the first gap.
+
+    longest is rebuilt from the daily rows too, since removed activity can shorten it.
+    """
+    days = db.session.query(DailyStats.day).filter(
+        DailyStats.user_id == streak.user_id, _active()
+    ).order_by(DailyStats.day.desc())
+
+    streak.current, streak.last_active = 0, None
+    for (day,) in days.yield_per(100):
+        if streak.last_active is None:
+            streak.last_active = day
+        elif day != streak.last_active - timedelta(days=streak.current):
+            break
+        streak.current += 1
+    streak.longest = _longest_run(streak.user_id)
+
+def _longest_run(user_id):
+    """Longest run of consecutive active days over the whole history"""
+    days = db.session.query(DailyStats.day).filter(
+        DailyStats.user_id == user_id, _active()
+    ).order_by(DailyStats.day)
+
+    longest = run = 0
+    previous = None
+    for (day,) in days.yield_per(100):
+        run = run + 1 if previous and day == previous + timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    return longest
+
+def update_streak(user_id, days):
+    """Fold rollup changes on `days` into the user's streak.
+
+    New activity after the last active day extends or restarts the streak in
+    place; changes to earlier days can join or split runs, so those rescan.
+    """
+    if not days:
+        return
+    rows = DailyStats.query.filter(
+        DailyStats.user_id == user_id, DailyStats.day.in_(list(days))
+    ).execution_options(populate_existing=True).all()
+    active = {row.day for row in rows if row.is_active()}
+
+    streak = db.session.get(StudyStreak, user_id)
+    if not streak:
+        streak = StudyStreak(user_id=user_id, current=0, longest=0)
+        db.session.add(streak)
+
+    last = streak.last_active
+    if last and any(day < last or (day == last and day not in active) for day in days):
+        _recompute_streak(streak)
+        return
+
+    for day in sorted(active):
+        if last and day == last:
+            continue
+        streak.current = streak.current + 1 if last and day == last + timedelta(days=1) else 1
+        streak.longest = max(streak.longest or 0, streak.current)
+        last = streak.last_active = day
+
+def session_snapshot(session):
+    """The StudySession fields the rollups depend on, in bulk-import row shape"""
+    return {
+        'session_date': session.session_date,
+        'subject': session.subject,
+        'duration': session.duration,
+        'status': session.status or 'scheduled'
+    }
+
+def _session_counts(values):
+    status = values.get('status') or 'scheduled'
+    if status == 'cancelled':
+        return None
+    completed = status == 'completed'
+    return {
+        'planned_sessions': 1,
+        'completed_sessions': 1 if completed else 0,
+        'study_minutes': (values.get('duration') or 0) if completed else 0
+    }
+
+def track_sessions(user_id, before=(), after=()):
+    """Replace the contribution of the `before` session snapshots with `after`"""
+    user_id = int(user_id)
+    daily = defaultdict(lambda: dict.fromkeys(SESSION_COUNTERS, 0))
+    subjects = defaultdict(lambda: dict.fromkeys(SESSION_COUNTERS, 0))
+
+    for values, sign in [(v, -1) for v in before] + [(v, 1) for v in after]:
+        counts = _session_counts(values)
+        if not counts:
+            continue
+        for name, value in counts.items():
+            daily[values['session_date']][name] += sign * value
+            subjects[values['subject']][name] += sign * value
+
+    increment_rows(DailyStats, ('user_id', 'day'), [
+        {'user_id': user_id, 'day': day, **counts}
+        for day, counts in daily.items() if any(counts.values())
+    ])
+    increment_rows(SubjectStats, ('user_id', 'subject'), [
+        {'user_id': user_id, 'subject': subject, **counts}
+        for subject, counts in subjects.items() if any(counts.values())
+    ])
+    update_streak(user_id, set(daily))
+
+def track_pomodoro(user_id, totals):
+    """Add {day: (sessions_completed, focus_seconds)} to the daily rollups"""
+    user_id = int(user_id)
+    increment_rows(DailyStats, ('user_id', 'day'), [
+        {'user_id': user_id, 'day': day, 'pomodoro_sessions': sessions, 'focus_time': focus_time}
+        for day, (sessions, focus_time) in totals.items() if sessions or focus_time
+    ])
+    update_streak(user_id, set(totals))
+
+def quiz_snapshot(quiz):
+    """A quiz's share of the rollups as (day, score, max_score), or None while it is not completed"""
+    if not quiz.completed or not quiz.created_at:
+        return None
+    return quiz.created_at.date(), quiz.score or 0, quiz.max_score or 0
+
+def track_quiz(user_id, before, after):
+    """Replace a quiz's contribution given its quiz_snapshot() before and after a change.
+
+    A completed quiz counts as one attempt on the day it was created, with its
+    latest score, which is what rebuild() derives from the quizzes table, so a
+    resubmission moves the totals instead of adding to them.
+    """
+    user_id = int(user_id)
+    daily = defaultdict(lambda: {'quiz_attempts': 0, 'quiz_score': 0, 'quiz_max_score': 0})
+    for snapshot, sign in ((before, -1), (after, 1)):
+        if snapshot:
+            day, score, max_score = snapshot
+            daily[day]['quiz_attempts'] += sign
+            daily[day]['quiz_score'] += sign * score
+            daily[day]['quiz_max_score'] += sign * max_score
+
+    increment_rows(DailyStats, ('user_id', 'day'), [
+        {'user_id': user_id, 'day': day, **counts}
+        for day, counts in daily.items() if any(counts.values())
+    ])
+    update_streak(user_id, set(daily))
+
+def rebuild(user_id=None):
+    """Recompute every rollup from the source tables (all users when user_id is None)"""
+    scope = (lambda query, model: query.filter(model.user_id == user_id)) if user_id else (lambda query, model: query)
+    for model in (DailyStats, SubjectStats, StudyStreak):
+        scope(model.query, model).delete()
+
+    completed = (StudySession.status == 'completed')
+    counts = (
+        func.count(StudySession.id),
+        func.sum(case((completed, 1), else_=0)),
+        func.sum(case((completed, func.coalesce(StudySession.duration, 0)), else_=0))
+    )
+    sessions = scope(db.session.query(StudySession.user_id), StudySession).filter(
+        or_(StudySession.status.is_(None), StudySession.status != 'cancelled')
+    )
+    for group, model, key in (
+        (StudySession.session_date, DailyStats, 'day'),
+        (StudySession.subject, SubjectStats, 'subject')
+    ):
+        increment_rows(model, ('user_id', key), [
+            {'user_id': uid, key: value, **dict(zip(SESSION_COUNTERS, (n or 0 for n in totals)))}
+            for uid, value, *totals in sessions.add_columns(group, *counts).group_by(StudySession.user_id, group)
+        ])
+
+    pomodoro = scope(db.session.query(
+        PomodoroStats.user_id, PomodoroStats.date,
+        func.sum(PomodoroStats.sessions_completed), func.sum(PomodoroStats.total_focus_time)
+    ), PomodoroStats).group_by(PomodoroStats.user_id, PomodoroStats.date)
+    increment_rows(DailyStats, ('user_id', 'day'), [
+        {'user_id': uid, 'day': day, 'pomodoro_sessions': s or 0, 'focus_time': f or 0}
+        for uid, day, s, f in pomodoro if day
+    ])
+
+    quiz_day = func.date(Quiz.created_at)
+    quizzes = scope(db.session.query(
+        Quiz.user_id, quiz_day, func.count(Quiz.id), func.sum(Quiz.score), func.sum(Quiz.max_score)
+    ), Quiz).filter(Quiz.completed.is_(True), Quiz.created_at.isnot(None)).group_by(Quiz.user_id, quiz_day)
+    increment_rows(DailyStats, ('user_id', 'day'), [
+        {'user_id': uid, 'day': date.fromisoformat(str(day)), 'quiz_attempts': n,
+         'quiz_score': s or 0, 'quiz_max_score': m or 0}
+        for uid, day, n, s, m in quizzes
+    ])
+
+    user_ids = [user_id] if user_id else [uid for (uid,) in db.session.query(DailyStats.user_id).distinct()]
+    for uid in user_ids:
+        streak = StudyStreak(user_id=uid, current=0, longest=0)
+        db.session.add(streak)
+        _recompute_streak(streak)
+    db.session.commit()
+
+def summary(user_id, days=30):
+    """Daily and weekly totals for the last `days` days plus subject, quiz and streak figures"""
+    user_id = int(user_id)
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+
+    rows = {
+        row.day: row for row in DailyStats.query.filter(
+            DailyStats.user_id == user_id, DailyStats.day.between(start, end)
+        )
+    }
+    daily = [
+        rows[day].to_dict() if day in rows else DailyStats(day=day).to_dict()
+        for day in (start + timedelta(days=n) for n in range(days))
+    ]
+
+    weeks = {}
+    for entry in daily:
+        day = date.fromisoformat(entry['date'])
+        week_start = (day - timedelta(days=day.weekday())).isoformat()
+        week = weeks.setdefault(week_start, {'week_start': week_start})
+        for name, value in entry.items():
+            if name != 'date':
+                week[name] = week.get(name, 0) + value
+
+    totals = {name: sum(entry[name] for entry in daily) for name in daily[0] if name != 'date'}
+
+    subjects = SubjectStats.query.filter_by(user_id=user_id).order_by(SubjectStats.study_minutes.desc())
+
+    streak = db.session.get(StudyStreak, user_id)
+    current = 0
+    if streak and streak.last_active and streak.last_active >= end - timedelta(days=1):
+        current = streak.current
+
+    return {
+        'range': {'start': start.isoformat(), 'end': end.isoformat()},
+        'daily': daily,
+        'weekly': list(weeks.values()),
+        'totals': totals,
+        'subjects': [subject.to_dict() for subject in subjects],
+        'quiz_accuracy': (
+            round(100 * totals['quiz_score'] / totals['quiz_max_score'], 1)
+            if totals['quiz_max_score'] else None
+        ),
+        'streak': {
+            'current': current,
+            'longest': streak.longest if streak else 0,
+            'last_active': streak.last_active.isoformat() if streak and streak.last_active else None
+        }
+    }
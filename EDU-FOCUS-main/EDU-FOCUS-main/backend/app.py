@@ -1,7 +1,18 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from models import db, bcrypt
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db
+from ai_cache import response_cache
+from semantic_cache import semantic_cache
+from ai_gateway import ai_gateway
+from llm import llm
+from usage import usage_ledger
+from jobs import job_queue
+from extraction import extraction_queue
+from passwords import password_hasher
+from rate_limit import login_limiter
+from user_cache import user_cache
 from config import config
 import os
 
@@ -12,17 +23,34 @@ def create_app(config_name='development'):
     # Load configuration
     app.config.from_object(config[config_name])
     
+    # Multipart files are spooled straight into the upload folder
+    from routes.uploads import UploadRequest
+    app.request_class = UploadRequest
+    
+    # Trust X-Forwarded-For only from our own proxies, so clients cannot pick their address
+    if app.config['TRUSTED_PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+    
     # Initialize extensions
     db.init_app(app)
-    bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    login_limiter.init_app(app)
+    user_cache.init_app(app)
+    response_cache.init_app(app)
+    semantic_cache.init_app(app)
+    ai_gateway.init_app(app)
+    llm.init_app(app)
+    usage_ledger.init_app(app)
+    job_queue.init_app(app)
+    extraction_queue.init_app(app)
     jwt = JWTManager(app)
     
     # Enable CORS
     CORS(app, resources={
         r"/api/*": {
             "origins": app.config['CORS_ORIGINS'],
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"]
         }
     })
     
@@ -30,14 +58,22 @@ def create_app(config_name='development'):
     from routes.auth import auth_bp
     from routes.study_tools import study_bp
     from routes.ai_features import ai_bp
+    from routes.uploads import uploads_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(study_bp, url_prefix='/api/study')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    app.register_blueprint(uploads_bp, url_prefix='/api/uploads')
     
-    # Create database tables
+    # Create database tables and upgrade existing ones
+    from migrations import run_migrations
     with app.app_context():
         db.create_all()
+        run_migrations()
+    
+    # Job workers need the tables; scripts that only build the app leave them off
+    if app.config['AI_JOB_WORKERS_AUTOSTART']:
+        job_queue.start()
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
@@ -68,6 +104,14 @@ def create_app(config_name='development'):
     def missing_token_callback(error):
         return jsonify({'error': 'Authorization token is missing'}), 401
     
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_payload):
+        return user_cache.get(jwt_payload[app.config['JWT_IDENTITY_CLAIM']])
+    
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'User not found'}), 401
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+"""AI tier throughput and latency benchmark, offline.
+
+Runs the app against the fake LLM backend (see LLM_FAKE_PROFILES) with a
+throwaway database, fires concurrent requests at one AI endpoint from one
+user per thread, and prints throughput, median/p95 latency and the status
+codes returned. Gateway rejections (429/503) show where admission limits cut
+in. Prompts are unique per request unless --duplicates is set, which makes
+every thread ask the same thing and exercises in-flight coalescing.
+
+    python bench_ai.py [--endpoint recommendations] [--profile typical] [--requests 200] [--threads 16]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = {
+    'chat': ('/api/ai/chat', lambda i: {'message': f'Explain topic {i}'}),
+    'recommendations': ('/api/ai/recommendations', lambda i: {'performance': {'sessions': i}, 'study_history': ['math']}),
+    'study-guide': ('/api/ai/study-guide', lambda i: {'topic': f'Topic {i}', 'format': 'quick'}),
+    'summarize-video': ('/api/ai/summarize-video', lambda i: {'title': f'Video {i}', 'transcript': 'words ' * 200}),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--endpoint', choices=ENDPOINTS, default='recommendations')
+    parser.add_argument('--profile', default='typical')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duplicates', action='store_true')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['AI_JOB_WORKERS_AUTOSTART'] = 'false'
+    from app import create_app
+    from config import config
+
+    settings = config['development']
+    settings.LLM_BACKEND = 'fake'
+    settings.LLM_ROUTES = {}
+    settings.LLM_FAKE_PROFILE = args.profile
+    settings.AI_CACHE_ENABLED = False
+    settings.AI_DAILY_TOKEN_QUOTA = None
+    settings.AI_CACHE_PATH = os.path.join(tmp, 'ai_cache.db')
+    settings.BCRYPT_LOG_ROUNDS = 4
+    settings.LOGIN_RATE_LIMIT_ENABLED = False
+    app = create_app()
+
+    client = app.test_client()
+    headers = []
+    for i in range(args.threads):
+        token = client.post('/api/auth/register', json={
+            'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password': 'password'
+        }).get_json()['access_token']
+        headers.append({'Authorization': f'Bearer {token}'})
+
+    path, body = ENDPOINTS[args.endpoint]
+
+    def request(i):
+        start = time.perf_counter()
+        response = app.test_client().post(path, headers=headers[i % args.threads],
+                                          json=body(0 if args.duplicates else i))
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    timings = sorted(ms for status, ms in results if status == 200)
+    statuses = Counter(status for status, _ in results)
+    print(f'{args.endpoint} on fake-{args.profile}: {args.requests} requests, {args.threads} threads')
+    print(f'  {statuses[200] / elapsed:.1f} successful req/s over {elapsed:.2f}s')
+    if timings:
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f'  latency median {statistics.median(timings):.0f} ms  p95 {p95:.0f} ms')
+    print('  status ' + '  '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+    print(f"  gateway {app.extensions['ai_gateway'].get_stats()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
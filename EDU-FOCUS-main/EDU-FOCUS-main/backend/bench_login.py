@@ -0,0 +1,70 @@
+"""Login throughput benchmark.
+
+Registers a set of users in a throwaway SQLite database, then fires
+concurrent /api/auth/login requests for each hashing pool size and prints
+logins per second. With hashing in a process pool, throughput should rise
+with the number of workers up to the CPU count.
+
+    python bench_login.py [--requests 200] [--threads 16] [--rounds 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def run(workers, requests, threads, rounds, db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['AI_JOB_WORKERS_AUTOSTART'] = 'false'
+    from app import create_app
+    from config import config
+    
+    settings = config['development']
+    settings.BCRYPT_LOG_ROUNDS = rounds
+    settings.PASSWORD_HASH_WORKERS = workers
+    settings.LOGIN_RATE_LIMIT_ENABLED = False
+    app = create_app()
+    
+    users = [f'bench{i}' for i in range(threads)]
+    client = app.test_client()
+    for name in users:
+        client.post('/api/auth/register', json={'username': name, 'email': f'{name}@example.com', 'password': 'password'})
+    
+    def login(i):
+        response = app.test_client().post('/api/auth/login', json={'username': users[i % len(users)], 'password': 'password'})
+        return response.status_code
+    
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, range(threads)))  # warm up the hashing processes
+        start = time.perf_counter()
+        statuses = list(pool.map(login, range(requests)))
+        elapsed = time.perf_counter() - start
+    
+    failures = sum(1 for status in statuses if status != 200)
+    return requests / elapsed, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost')
+    args = parser.parse_args()
+    
+    cpus = os.cpu_count() or 1
+    sizes = sorted({1, 2, cpus // 2 or 1, cpus})
+    print(f'{args.requests} logins, {args.threads} client threads, bcrypt cost {args.rounds}, {cpus} CPUs')
+    
+    for workers in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # Each pool size runs in a fresh interpreter so extensions start clean
+            pid = os.fork()
+            if pid == 0:
+                rate, failures = run(workers, args.requests, args.threads, args.rounds, os.path.join(tmp, 'bench.db'))
+                print(f'workers={workers:<3} {rate:8.1f} logins/s  failures={failures}')
+                sys.stdout.flush()
+                os._exit(0)
+            os.waitpid(pid, 0)
+
+if __name__ == '__main__':
+    main()
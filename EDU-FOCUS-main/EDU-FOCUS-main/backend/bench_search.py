@@ -0,0 +1,70 @@
+"""Search latency benchmark.
+
+Fills a throwaway SQLite database with generated notes for one user (plus a
+second user so the owner filter has something to skip), then times
+search.search() for a handful of queries and prints median and p95 latency.
+
+    python bench_search.py [--documents 100000] [--repeat 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Zipf-distributed synthetic vocabulary, so queries range from near-stopwords
+# (w1) to rare terms (w3000)
+VOCABULARY = [f'w{rank}' for rank in range(1, 5001)]
+WEIGHTS = [1 / rank for rank in range(1, 5001)]
+QUERIES = ['w1', 'w10', 'w100', 'w1000', 'w3000', 'w20 w200', 'w12']
+
+def sentence(rng, length):
+    return ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=length))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--documents', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['AI_JOB_WORKERS_AUTOSTART'] = 'false'
+    from app import create_app
+    from models import db, User, Note
+    import search
+
+    app = create_app()
+    rng = random.Random(0)
+    with app.app_context():
+        users = [User(username=f'bench{i}', email=f'bench{i}@example.com', password_hash='-') for i in range(2)]
+        db.session.add_all(users)
+        db.session.commit()
+
+        start = time.perf_counter()
+        for user in users:
+            rows = [{
+                'user_id': user.id,
+                'title': sentence(rng, 4),
+                'content': sentence(rng, 80),
+                'tags': ','.join(rng.choices(VOCABULARY, WEIGHTS, k=2))
+            } for _ in range(args.documents)]
+            db.session.execute(db.insert(Note), rows)
+        db.session.commit()
+        print(f'indexed {2 * args.documents} notes in {time.perf_counter() - start:.1f}s')
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits, _ = search.search(users[0].id, query, limit=20)
+                timings.append((time.perf_counter() - start) * 1000)
+            p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+            print(f'{query!r:12} {len(hits):3} hits  median {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms')
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
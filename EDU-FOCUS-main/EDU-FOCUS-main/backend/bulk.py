@@ -0,0 +1,129 @@
+from sqlalchemy import insert
+from models import db
+from tags import clean_tags
+from datetime import datetime
+import csv
+import io
+import json
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+def read_rows(stream, content_type):
+    """Yield (line_number, row_dict_or_None, error_or_None) from an NDJSON or CSV body.
+    
+    The body is decoded incrementally, so memory use does not grow with the
+    size of the upload. CSV needs a header row.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    
+    if content_type and 'csv' in content_type:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, row, None
+
+def _required(row, field):
+    value = row.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f'{field} is required')
+    return value
+
+def card_values(row, deck_id):
+    """Validate an imported flashcard row into insert values"""
+    return {
+        'deck_id': deck_id,
+        'question': _required(row, 'question'),
+        'answer': _required(row, 'answer'),
+        'difficulty': row.get('difficulty') or 'medium'
+    }
+
+def note_values(row, user_id):
+    """Validate an imported note row; tags may be a list or a comma-separated string"""
+    tags = clean_tags(row.get('tags'))
+    return {
+        'user_id': user_id,
+        'title': _required(row, 'title'),
+        'content': _required(row, 'content'),
+        'tags': ','.join(tags)
+    }
+
+def session_values(row, user_id):
+    """Validate an imported study session row (date YYYY-MM-DD, time HH:MM)"""
+    duration = row.get('duration')
+    return {
+        'user_id': user_id,
+        'subject': _required(row, 'subject'),
+        'session_date': datetime.strptime(_required(row, 'date'), '%Y-%m-%d').date(),
+        'session_time': datetime.strptime(_required(row, 'time'), '%H:%M').time(),
+        'duration': int(duration) if duration not in (None, '') else None,
+        'goals': row.get('goals') or None,
+        'status': row.get('status') or 'scheduled'
+    }
+
+def bulk_import(model, rows, to_values, on_batch=None):
+    """Validate rows and insert the valid ones in batches inside one transaction.
+    
+    Each batch is a single executemany INSERT, followed by on_batch(batch, ids)
+    if given; the transaction commits once at the end. Returns (imported, errors, error_count); errors lists
+    {'line': n, 'error': message} entries, capped at MAX_REPORTED_ERRORS.
+    """
+    table = model.__table__
+    batch, imported, errors, error_count = [], 0, [], 0
+    
+    def record_error(line_number, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_number, 'error': message})
+    
+    def insert_batch(batch):
+        if not on_batch:
+            db.session.execute(insert(table), batch)
+            return
+        result = db.session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), batch)
+        on_batch(batch, result.scalars().all())
+    
+    try:
+        for line_number, row, error in rows:
+            if error:
+                record_error(line_number, error)
+                continue
+            try:
+                batch.append(to_values(row))
+            except (ValueError, TypeError) as e:
+                record_error(line_number, str(e))
+                continue
+            
+            if len(batch) >= BATCH_SIZE:
+                insert_batch(batch)
+                imported += len(batch)
+                batch = []
+        
+        if batch:
+            insert_batch(batch)
+            imported += len(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return imported, errors, error_count
+
+def export_ndjson(query, serialize=None):
+    """Yield one JSON line per row, fetching rows from the cursor in batches"""
+    for row in query.yield_per(BATCH_SIZE):
+        yield json.dumps(serialize(row) if serialize else row.to_dict()) + '\n'
@@ -13,14 +13,119 @@ class Config:
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    USER_CACHE_TTL = 60  # seconds a cached user record is trusted
+    USER_CACHE_SIZE = 4096
+    
+    # Password hashing
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))  # existing hashes are upgraded at login
+    PASSWORD_HASH_WORKERS = None  # processes; defaults to the CPU count
+    PASSWORD_HASH_QUEUE = 64  # hash calls allowed to wait for a worker
+    PASSWORD_HASH_WAIT = 10  # seconds to wait for a slot before answering 503
+    
+    # Login attempt limits: (burst capacity, attempts regained per minute).
+    # The username bucket does the work; the IP bucket only stops one address
+    # spraying many usernames, and is large because campus networks share NATs.
+    LOGIN_RATE_LIMIT_ENABLED = True
+    LOGIN_RATE_PER_USERNAME = (5, 5)
+    LOGIN_RATE_PER_IP = (300, 300)
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))  # reverse proxies in front of the app
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') or 'sk-proj-3arCQq4G1mlnNrC4mq6L870GQp-nvbsK2Bn1syYWPCGDvmv_CxtaaWju-SYVShB6Wu5XCpUoLHEpT3Blbk-FJF150m9fxPPyeGCh8lCd4mOC9wi6ujx-B81cTvatmWmHuH-WhqAGE9MykYC_mjNcFNEbSkh_gyAA'
     
+    # LLM backends: 'openai', or 'fake' for offline load tests and benchmarks
+    LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+    LLM_ROUTES = {}  # per-endpoint overrides, e.g. {'chat': 'openai', 'summarize-pdf': 'fake'}
+    LLM_MODEL = 'gpt-3.5-turbo'
+    LLM_FAKE_PROFILE = os.environ.get('LLM_FAKE_PROFILE', 'typical')
+    LLM_FAKE_PROFILES = {
+        # latency: seconds to first token; tokens_per_second: 0 means instant
+        'instant': {'latency': 0.0, 'tokens_per_second': 0, 'reply_tokens': 50},
+        'typical': {'latency': 0.5, 'tokens_per_second': 60, 'reply_tokens': 250, 'jitter': 0.3},
+        'slow': {'latency': 2.0, 'tokens_per_second': 20, 'reply_tokens': 400, 'jitter': 0.5},
+    }
+    
     # File Upload Configuration
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'pdf', 'txt', 'doc', 'docx'}
+    UPLOAD_EXTRACT_WORKERS = 2  # text extraction processes
+    UPLOAD_MAX_EXTRACTED_BYTES = 50 * 1024 * 1024  # cap on the text read from one upload (zip bombs)
+    UPLOAD_EXTRACT_TIMEOUT = 300  # seconds a document may stay pending before extraction is queued again
+    
+    # Pagination
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    
+    # Full-text search: only the newest matches of each kind are ranked
+    SEARCH_CANDIDATES = 500
+    
+    # Mind map patches
+    MINDMAP_MAX_OPS = 500  # operations per patch request
+    MINDMAP_COMPACT_OPS = 100  # patches kept before they are folded into the snapshot
+    
+    # Offline pomodoro events: ids remembered to drop resent copies
+    POMODORO_EVENT_RETENTION = timedelta(days=30)
+    POMODORO_EVENT_PRUNE_INTERVAL = 3600  # seconds between deletes of expired ids
+    
+    # Flashcard review
+    DUE_CARDS_LIMIT = 20
+    
+    # AI response cache
+    AI_CACHE_ENABLED = True
+    AI_CACHE_PATH = os.environ.get('AI_CACHE_PATH')  # defaults to instance/ai_cache.db
+    AI_CACHE_MEMORY_ENTRIES = 256
+    AI_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    AI_CACHE_TTL = timedelta(days=7)
+    AI_CACHE_EVICT_EVERY = 100  # run eviction once per this many writes
+    
+    # Near-duplicate prompt cache (study guides, recommendations)
+    SEMANTIC_CACHE_ENABLED = True
+    SEMANTIC_CACHE_THRESHOLD = 0.9  # cosine similarity needed to reuse a stored response
+    SEMANTIC_CACHE_ENTRIES = 2048
+    
+    # AI gateway: upstream concurrency and admission limits
+    AI_GATEWAY_WORKERS = 8
+    AI_GATEWAY_QUEUE_SIZE = 16  # calls allowed to wait beyond the running ones
+    AI_GATEWAY_PER_USER = 2
+    AI_GATEWAY_ADMISSION_WAIT = 2  # seconds an admitted call may wait for a free worker before a 503
+    AI_GATEWAY_TIMEOUT = 90  # seconds an upstream call may run once started
+    AI_GATEWAY_RETRY_AFTER = 5  # seconds, sent with 429/503
+    
+    # Background AI jobs ("async": true)
+    AI_JOB_WORKERS_AUTOSTART = os.environ.get('AI_JOB_WORKERS_AUTOSTART', 'true').lower() == 'true'
+    AI_JOB_WORKERS = {'interactive': 2, 'bulk': 2}  # threads per lane; bulk workers also take interactive jobs
+    AI_JOB_LANES = {'chat': 'interactive', 'recommendations': 'interactive'}  # other endpoints run as bulk
+    AI_JOB_MAX_QUEUED_PER_USER = 20
+    AI_JOB_MAX_ATTEMPTS = 5  # runs per job when the gateway or provider asks to retry later
+    AI_JOB_POLL_INTERVAL = 1  # seconds an idle worker waits before checking the table again
+    AI_JOB_LEASE = 600  # seconds a worker's claim lasts without renewal; it renews every third of this
+    AI_JOB_RETENTION = timedelta(days=2)  # finished jobs kept for polling
+    
+    # AI token accounting
+    AI_DAILY_TOKEN_QUOTA = 200000  # tokens per user per UTC day; None disables the quota
+    AI_USAGE_FLUSH_INTERVAL = 5  # seconds between usage ledger writes
+    AI_USAGE_FLUSH_SIZE = 500  # buffered calls that trigger an early write
+    AI_USAGE_SYNC_INTERVAL = 30  # seconds a user's in-memory daily total is trusted
+    AI_TOKEN_PRICES = {'gpt-3.5-turbo': (0.0005, 0.0015)}  # USD per 1K prompt / completion tokens
+    
+    # Long-document summarization
+    AI_CHUNK_TOKENS = 1000  # max size of a chunk and of the final condensed text
+    AI_CHUNK_SUMMARY_TOKENS = 200
+    AI_SUMMARY_PARALLELISM = 4  # chunk summaries in flight per document
+    
+    # Flashcard generation
+    AI_FLASHCARD_MAX = 200  # cards per request
+    AI_FLASHCARD_BATCH = 25  # cards per model call
+    AI_FLASHCARD_PARALLELISM = 4  # batches in flight per request
+    
+    # Chat context
+    AI_CHAT_CONTEXT_TOKENS = 2000  # prompt budget for summary + recent turns
+    AI_CHAT_MAX_TURNS = 40  # most recent turns considered per request
+    AI_CHAT_SUMMARY_TOKENS = 300
+    
+    # Users allowed to read the cross-user /api/ai/*/stats endpoints (comma-separated ids)
+    ADMIN_USER_IDS = {int(i) for i in os.environ.get('ADMIN_USER_IDS', '').split(',') if i.strip()}
     
     # CORS Configuration
     CORS_ORIGINS = ['http://localhost:8000', 'http://127.0.0.1:8000']
@@ -0,0 +1,114 @@
+from flask import current_app
+from ai_streaming import estimate_tokens
+from models import db, ConversationHistory, ConversationSummary
+
+SYSTEM_PROMPT = "You are a helpful AI study assistant. Help students with their studies, answer questions, and provide educational support."
+
+def _unsummarized(user_id, summary, limit):
+    """Newest turns not yet folded into the summary, newest first"""
+    query = ConversationHistory.query.filter(ConversationHistory.user_id == user_id)
+    if summary:
+        query = query.filter(ConversationHistory.id > summary.covers_until_id)
+    return query.order_by(ConversationHistory.created_at.desc(), ConversationHistory.id.desc()).limit(limit).all()
+
+def _turn_tokens(turn):
+    return turn.tokens if turn.tokens is not None else estimate_tokens(turn.content)
+
+def build_messages(user_id, message):
+    """Assemble the prompt for a chat turn within AI_CHAT_CONTEXT_TOKENS.
+    
+    Recent turns are added newest-first until the budget is spent; anything
+    older is represented by the rolling summary. Returns (messages,
+    needs_compaction), the latter True when stored turns fell out of the
+    window, including turns older than the newest AI_CHAT_MAX_TURNS.
+    """
+    budget = current_app.config['AI_CHAT_CONTEXT_TOKENS'] - estimate_tokens(SYSTEM_PROMPT) - estimate_tokens(message)
+    summary = ConversationSummary.query.filter_by(user_id=user_id).first()
+    if summary:
+        budget -= estimate_tokens(summary.content)
+    
+    # One turn past the cap tells whether older unsummarized turns exist
+    max_turns = current_app.config['AI_CHAT_MAX_TURNS']
+    turns = _unsummarized(user_id, summary, max_turns + 1)
+    kept = []
+    for turn in turns[:max_turns]:
+        budget -= _turn_tokens(turn)
+        if budget < 0:
+            break
+        kept.append(turn)
+    
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary.content}"})
+    messages.extend({"role": t.role, "content": t.content} for t in reversed(kept))
+    messages.append({"role": "user", "content": message})
+    
+    return messages, len(kept) < len(turns)
+
+def record_turn(user_id, message, reply):
+    """Persist a user message and the assistant's reply"""
+    db.session.add_all([
+        ConversationHistory(user_id=user_id, role='user', content=message, tokens=estimate_tokens(message)),
+        ConversationHistory(user_id=user_id, role='assistant', content=reply, tokens=estimate_tokens(reply))
+    ])
+    db.session.commit()
+
+def _summary_prompt(current, turns):
+    transcript = '\n'.join(f'{t.role}: {t.content}' for t in turns)
+    return f"""Update the running summary of a tutoring conversation with the new exchanges below.
+Keep topics, questions asked, explanations given and anything the student struggled with.
+
+Current summary: {current or '(none)'}
+
+New exchanges:
+{transcript}"""
+
+def compact(app, user_id, complete):
+    """Fold every turn before the recent window into the rolling summary.
+    
+    Runs off the request thread; complete(prompt, max_tokens) performs the
+    upstream summarization call. A long backlog is folded in chunks of about
+    AI_CHAT_CONTEXT_TOKENS so no single prompt grows without bound.
+    """
+    with app.app_context():
+        budget = app.config['AI_CHAT_CONTEXT_TOKENS'] // 2
+        summary = ConversationSummary.query.filter_by(user_id=user_id).first()
+        recent = _unsummarized(user_id, summary, app.config['AI_CHAT_MAX_TURNS'])
+        if not recent:
+            return
+        
+        # Keep the newest half-budget of turns verbatim; fold everything older
+        kept = 0
+        for turn in recent:
+            budget -= _turn_tokens(turn)
+            if budget < 0:
+                break
+            kept += 1
+        query = ConversationHistory.query.filter(
+            ConversationHistory.user_id == user_id,
+            ConversationHistory.id < (recent[kept - 1].id if kept else recent[0].id + 1)
+        )
+        if summary:
+            query = query.filter(ConversationHistory.id > summary.covers_until_id)
+        folded = query.order_by(ConversationHistory.id).all()
+        if not folded:
+            return
+        
+        chunks, size = [[]], 0
+        for turn in folded:
+            if chunks[-1] and size + _turn_tokens(turn) > app.config['AI_CHAT_CONTEXT_TOKENS']:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(turn)
+            size += _turn_tokens(turn)
+        
+        for chunk in chunks:
+            content = complete(_summary_prompt(summary.content if summary else None, chunk),
+                               app.config['AI_CHAT_SUMMARY_TOKENS'])
+            if summary:
+                summary.content = content
+                summary.covers_until_id = chunk[-1].id
+            else:
+                summary = ConversationSummary(user_id=user_id, content=content, covers_until_id=chunk[-1].id)
+                db.session.add(summary)
+            db.session.commit()
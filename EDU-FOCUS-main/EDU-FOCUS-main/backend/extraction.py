@@ -0,0 +1,165 @@
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+
+CHUNK_SIZE = 64 * 1024
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+PRINTABLE_RUN = re.compile(rb'[\x20-\x7e\r\n\t]{4,}')
+
+def _spooled_in(stream, folder):
+    # True for a request file that UploadRequest already wrote to disk inside folder
+    name = getattr(stream, 'name', None)
+    return isinstance(name, str) and os.path.dirname(os.path.abspath(name)) == os.path.abspath(folder)
+
+def _link_spooled(stream, folder, extension):
+    stream.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    
+    content_hash = digest.hexdigest()
+    path = os.path.join(folder, f'{content_hash}.{extension}')
+    try:
+        # The spooled file is deleted when the request closes; the link keeps its bytes
+        os.link(stream.name, path)
+    except FileExistsError:
+        pass  # same hash, same bytes
+    return content_hash, path, size
+
+def save_stream(stream, folder, extension):
+    """Store an upload in folder as <sha256>.<extension>, so identical uploads land on the same path.
+    
+    A file UploadRequest spooled into folder is hashed in place and hard-linked
+    to that name, so its bytes are written once. Any other stream is copied in
+    fixed-size chunks under a temporary name and renamed.
+    Returns (content_hash, path, size).
+    """
+    os.makedirs(folder, exist_ok=True)
+    if _spooled_in(stream, folder):
+        return _link_spooled(stream, folder, extension)
+    
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(folder, f'.upload-{os.getpid()}-{threading.get_ident()}.part')
+    
+    with open(tmp_path, 'wb') as out:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    
+    content_hash = digest.hexdigest()
+    path = os.path.join(folder, f'{content_hash}.{extension}')
+    os.replace(tmp_path, path)
+    return content_hash, path, size
+
+class TooLarge(ValueError):
+    """The extracted text would exceed UPLOAD_MAX_EXTRACTED_BYTES"""
+
+def _extract_pdf(path, max_bytes):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(path)
+    pages, size = [], 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        size += len(text)
+        if size > max_bytes:
+            raise TooLarge('Extracted text is too large')
+        pages.append(text)
+    return '\n\n'.join(pages)
+
+def _extract_docx(path, max_bytes):
+    # A few KB of zip can inflate to gigabytes: check the declared size, then
+    # read no more than the cap in case the header lies
+    with zipfile.ZipFile(path) as archive:
+        if archive.getinfo('word/document.xml').file_size > max_bytes:
+            raise TooLarge('Document is too large to extract')
+        with archive.open('word/document.xml') as member:
+            xml = member.read(max_bytes + 1)
+        if len(xml) > max_bytes:
+            raise TooLarge('Document is too large to extract')
+        root = ElementTree.fromstring(xml)
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NAMESPACE}p'):
+        paragraphs.append(''.join(node.text or '' for node in paragraph.iter(f'{WORD_NAMESPACE}t')))
+    return '\n\n'.join(p for p in paragraphs if p)
+
+def _extract_doc(path, max_bytes):
+    # Legacy binary .doc has no stdlib parser; keep the readable text runs
+    with open(path, 'rb') as f:
+        runs = PRINTABLE_RUN.findall(f.read(max_bytes))
+    return '\n'.join(run.decode('ascii').strip() for run in runs if run.strip())
+
+def _extract_txt(path, max_bytes):
+    with open(path, 'rb') as f:
+        return f.read(max_bytes).decode('utf-8', errors='replace')
+
+EXTRACTORS = {
+    'pdf': _extract_pdf,
+    'docx': _extract_docx,
+    'doc': _extract_doc,
+    'txt': _extract_txt
+}
+
+def extract_text(path, extension, max_bytes):
+    """Extract plain text from a stored upload, reading at most max_bytes of it. Runs in a worker process."""
+    return EXTRACTORS[extension](path, max_bytes).strip()
+
+class ExtractionQueue:
+    """Runs text extraction in a process pool so parsing never blocks a web worker"""
+    
+    def __init__(self, app=None):
+        self._executor = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['UPLOAD_EXTRACT_WORKERS']
+        self.max_bytes = app.config['UPLOAD_MAX_EXTRACTED_BYTES']
+        app.extensions['extraction_queue'] = self
+    
+    def _pool(self):
+        if self._executor is None:
+            # Forking the threaded server could copy locks held by its gateway, job
+            # and flusher threads into the workers; start them from a clean process
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._executor
+    
+    def submit(self, document_id, path, extension):
+        """Extract in the background and store the result on the Document row"""
+        app = self.app
+        future = self._pool().submit(extract_text, path, extension, self.max_bytes)
+        
+        def store(done):
+            from models import db, Document
+            with app.app_context():
+                document = db.session.get(Document, document_id)
+                try:
+                    document.text = done.result()
+                    document.status = 'ready'
+                except Exception as e:
+                    document.status = 'failed'
+                    document.error = str(e)
+                db.session.commit()
+        
+        future.add_done_callback(store)
+        return future
+
+extraction_queue = ExtractionQueue()
@@ -0,0 +1,113 @@
+"""Prompts and reply parsing for AI-generated flashcards.
+
+A request for many cards is split into batches of at most AI_FLASHCARD_BATCH
+cards that are generated in parallel. Each batch is asked to focus on a
+different angle of the subject so batches do not repeat each other, and
+unique_cards() drops whatever repeats remain.
+"""
+import json
+import re
+
+ANGLES = (
+    'core definitions and terminology',
+    'key processes and how they work',
+    'causes, effects and relationships between ideas',
+    'worked examples and applications',
+    'comparisons and distinctions between similar ideas',
+    'common misconceptions and tricky details',
+    'important facts, figures, names and dates',
+    'big-picture ideas and why they matter',
+)
+TOKENS_PER_CARD = 80
+CODE_FENCE = re.compile(r'^```\w*\s*$', re.MULTILINE)
+class DeckNotFound(LookupError):
+    """The target deck was deleted while its cards were being generated"""
+
+QUESTION = re.compile(r'^\s*(?:\d+[.)]\s*)?(?:\*\*)?(?:Q|Question)\s*\d*\s*(?:\*\*)?\s*[:.)-]\s*(?:\*\*)?\s*(.*)$', re.IGNORECASE)
+ANSWER = re.compile(r'^\s*(?:\*\*)?(?:A|Answer)\s*\d*\s*(?:\*\*)?\s*[:.)-]\s*(?:\*\*)?\s*(.*)$', re.IGNORECASE)
+
+def batch_sizes(count, batch_size):
+    """Split count cards into near-equal batches of at most batch_size"""
+    batches = -(-count // batch_size)
+    return [count // batches + (1 if i < count % batches else 0) for i in range(batches)]
+
+def card_prompts(count, batch_size, topic='', material=''):
+    """Return one (prompt, max_tokens) pair per batch"""
+    subject = f'"{topic}"' if topic else 'the study material below'
+    prompts = []
+    for i, size in enumerate(batch_sizes(count, batch_size)):
+        prompt = f"""Write {size} flashcards about {subject}.
+Focus on {ANGLES[i % len(ANGLES)]}.
+Each card tests one idea. Keep answers under 40 words.
+Return only JSON lines, one card per line, like:
+{{"question": "...", "answer": "..."}}"""
+        if material:
+            prompt += f'\n\nMaterial:\n{material}'
+        prompts.append((prompt, size * TOKENS_PER_CARD + 50))
+    return prompts
+
+def _json_cards(text):
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+    if isinstance(value, dict):
+        value = value.get('cards') or value.get('flashcards') or [value]
+    if isinstance(value, list):
+        return value
+
+    cards = []
+    for line in text.splitlines():
+        line = line.strip().rstrip(',')
+        if line.startswith('{'):
+            try:
+                cards.append(json.loads(line))
+            except ValueError:
+                continue
+    return cards
+
+def _labelled_cards(text):
+    # "Q: ... / A: ..." pairs, optionally numbered or bold; answers may run over several lines
+    cards, question, answer = [], None, None
+    for line in text.splitlines():
+        match = QUESTION.match(line)
+        if match:
+            if question and answer:
+                cards.append({'question': question, 'answer': ' '.join(answer)})
+            question, answer = match.group(1).strip(), None
+            continue
+        match = ANSWER.match(line)
+        if match and question:
+            answer = [match.group(1).strip()]
+        elif answer is not None and line.strip():
+            answer.append(line.strip())
+    if question and answer:
+        cards.append({'question': question, 'answer': ' '.join(answer)})
+    return cards
+
+def parse_cards(text):
+    """Return the [{'question', 'answer'}] cards in a model reply (JSON, JSON lines or Q:/A: text)"""
+    text = CODE_FENCE.sub('', text or '').strip()
+    cards = []
+    for card in _json_cards(text) or _labelled_cards(text):
+        if not isinstance(card, dict):
+            continue
+        question = str(card.get('question') or card.get('front') or '').strip()
+        answer = str(card.get('answer') or card.get('back') or '').strip()
+        if question and answer:
+            cards.append({'question': question, 'answer': answer})
+    return cards
+
+def unique_cards(replies, limit):
+    """Parse every batch reply and keep the first limit cards, dropping repeated questions"""
+    seen, cards = set(), []
+    for reply in replies:
+        for card in parse_cards(reply):
+            key = ' '.join(re.findall(r'\w+', card['question'].lower()))
+            if key in seen:
+                continue
+            seen.add(key)
+            cards.append(card)
+            if len(cards) == limit:
+                return cards
+    return cards
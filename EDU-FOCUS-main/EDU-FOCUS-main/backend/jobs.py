@@ -0,0 +1,270 @@
+"""Background AI jobs, persisted in the ai_jobs table.
+
+A request that sets "async": true is stored as a queued job and answered
+with 202 at once; a local pool of worker threads runs it and writes the
+result back, and clients poll GET /api/ai/jobs/<id>. Because jobs live in
+the database they survive worker restarts. A claimed job holds a lease
+token; its worker renews the lease while the handler runs, and a job whose
+lease lapses (its worker died) is put back in the queue. Results are only
+written under the token, so a worker that lost its lease cannot overwrite
+the row.
+
+Each endpoint belongs to a lane (AI_JOB_LANES, default bulk). Lanes are
+served in LANES order, and AI_JOB_WORKERS['interactive'] workers take only
+interactive jobs, so chat never waits behind a batch of study guides.
+
+An Idempotency-Key header makes submission safe to retry: the same key
+returns the existing job instead of starting a second generation.
+"""
+from datetime import datetime, timedelta
+import json
+import logging
+import threading
+import time
+import uuid
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from ai_gateway import GatewayError
+from flashcard_generation import DeckNotFound
+from llm import LLMError, llm
+from usage import MeteredBackend, QuotaExceeded, usage_ledger
+from models import db, AIJob
+
+logger = logging.getLogger(__name__)
+
+LANES = ('interactive', 'bulk')
+RETRYABLE = (429, 503, 504)  # admission limits and timeouts; the job is queued again
+
+class IdempotencyConflict(GatewayError):
+    """An Idempotency-Key was reused for a different request"""
+
+class JobQueue:
+    """Persists AI jobs and runs them on local worker threads"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers = {}
+        self._wake = threading.Condition()
+        self._threads = []
+        self._last_sweep = 0.0
+        self._stats_lock = threading.Lock()
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'reclaimed': 0,
+                      'lost': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.lanes = app.config['AI_JOB_LANES']
+        self.workers = app.config['AI_JOB_WORKERS']
+        self.max_queued = app.config['AI_JOB_MAX_QUEUED_PER_USER']
+        self.max_attempts = app.config['AI_JOB_MAX_ATTEMPTS']
+        self.poll_interval = app.config['AI_JOB_POLL_INTERVAL']
+        self.lease = timedelta(seconds=app.config['AI_JOB_LEASE'])
+        self.retention = app.config['AI_JOB_RETENTION']
+        self.retry_after = app.config['AI_GATEWAY_RETRY_AFTER']
+        app.extensions['job_queue'] = self
+
+    def start(self):
+        """Start the worker threads; call once the schema exists, in the serving process only"""
+        if not self._threads:
+            for lane in LANES:
+                # A worker serves its own lane and every lane ahead of it
+                served = LANES[:LANES.index(lane) + 1]
+                for i in range(self.workers.get(lane, 0)):
+                    thread = threading.Thread(target=self._run, args=(served,), name=f'ai-job-{lane}-{i}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def register(self, endpoint, handler):
+        """Run handler(backend, **params) for jobs of endpoint; it returns the JSON result"""
+        self.handlers[endpoint] = handler
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def submit(self, user_id, endpoint, params, idempotency_key=None):
+        """Queue a job; returns (job, created). A known idempotency key returns its job."""
+        encoded = json.dumps(params, sort_keys=True)
+        if idempotency_key:
+            job = AIJob.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+            if job:
+                return self._existing(job, endpoint, encoded), False
+
+        pending = AIJob.query.filter(
+            AIJob.user_id == user_id, AIJob.status.in_(('queued', 'running'))
+        ).count()
+        if pending >= self.max_queued:
+            raise GatewayError('Too many AI jobs in progress', 429, self.retry_after)
+
+        now = datetime.utcnow()
+        job = AIJob(
+            user_id=user_id,
+            endpoint=endpoint,
+            lane=self.lanes.get(endpoint, 'bulk'),
+            status='queued',
+            idempotency_key=idempotency_key,
+            params=encoded,
+            run_after=now,
+            created_at=now
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent retry with the same key got there first
+            db.session.rollback()
+            job = AIJob.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+            if job is None:
+                raise
+            return self._existing(job, endpoint, encoded), False
+
+        self._count('submitted')
+        with self._wake:
+            self._wake.notify()
+        return job, True
+
+    def _existing(self, job, endpoint, encoded):
+        if job.endpoint != endpoint or job.params != encoded:
+            raise IdempotencyConflict('Idempotency-Key was already used for a different request', 422)
+        self._count('deduplicated')
+        return job
+
+    def _claim(self, lanes):
+        """Lease the oldest runnable job of the first non-empty lane; returns (job id, lease token)"""
+        now = datetime.utcnow()
+        for lane in lanes:
+            candidates = db.session.query(AIJob.id).filter(
+                AIJob.status == 'queued', AIJob.lane == lane, AIJob.run_after <= now
+            ).order_by(AIJob.id).limit(5).all()
+            for (job_id,) in candidates:
+                # Another worker (or process) may have taken it since the select
+                token = uuid.uuid4().hex
+                claimed = db.session.execute(
+                    update(AIJob)
+                    .where(AIJob.id == job_id, AIJob.status == 'queued')
+                    .values(status='running', started_at=now, attempts=AIJob.attempts + 1,
+                            lease_token=token, leased_until=now + self.lease)
+                ).rowcount
+                db.session.commit()
+                if claimed:
+                    return job_id, token
+        return None
+
+    def _heartbeat(self, job_id, token):
+        """Renew the lease every third of AI_JOB_LEASE until the returned event is set"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease.total_seconds() / 3):
+                try:
+                    with self.app.app_context():
+                        db.session.execute(
+                            update(AIJob)
+                            .where(AIJob.id == job_id, AIJob.status == 'running', AIJob.lease_token == token)
+                            .values(leased_until=datetime.utcnow() + self.lease)
+                        )
+                        db.session.commit()
+                except Exception:
+                    logger.exception('Could not renew the lease of AI job %s', job_id)
+
+        threading.Thread(target=renew, name=f'ai-job-lease-{job_id}', daemon=True).start()
+        return stop
+
+    def _execute(self, job_id, token):
+        job = db.session.get(AIJob, job_id)
+        endpoint, user_id = job.endpoint, job.user_id
+        stop = self._heartbeat(job_id, token)
+        try:
+            # Jobs queued while under quota must not run once it is spent
+            usage_ledger.check(user_id)
+            handler = self.handlers[endpoint]
+            backend = MeteredBackend(llm.for_endpoint(endpoint), user_id, endpoint)
+            result = handler(backend, **json.loads(job.params))
+        except QuotaExceeded as e:
+            db.session.rollback()
+            self._finish(job_id, token, 'failed', error=str(e), error_status=e.status)
+        except DeckNotFound as e:
+            db.session.rollback()
+            self._finish(job_id, token, 'failed', error=str(e), error_status=404)
+        except (GatewayError, LLMError) as e:
+            db.session.rollback()
+            if e.status in RETRYABLE and job.attempts < self.max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=e.retry_after or self.retry_after)
+                self._finish(job_id, token, 'queued', run_after=retry_at)
+            else:
+                self._finish(job_id, token, 'failed', error=str(e), error_status=e.status)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('AI job %s (%s) failed', job_id, endpoint)
+            self._finish(job_id, token, 'failed', error=str(e), error_status=500)
+        else:
+            self._finish(job_id, token, 'done', result=json.dumps(result))
+        finally:
+            stop.set()
+
+    def _finish(self, job_id, token, status, **values):
+        """Write the outcome if this worker still holds the lease; 'queued' puts the job back for a retry"""
+        if status != 'queued':
+            values['finished_at'] = datetime.utcnow()
+        written = db.session.execute(
+            update(AIJob)
+            .where(AIJob.id == job_id, AIJob.status == 'running', AIJob.lease_token == token)
+            .values(status=status, lease_token=None, leased_until=None, **values)
+        ).rowcount
+        db.session.commit()
+        if not written:
+            logger.warning('AI job %s lost its lease; dropping its %s outcome', job_id, status)
+            self._count('lost')
+        else:
+            self._count({'done': 'completed', 'queued': 'retried'}.get(status, status))
+
+    def sweep(self):
+        """Requeue jobs whose lease lapsed (their worker died) and delete finished jobs past AI_JOB_RETENTION"""
+        now = datetime.utcnow()
+        reclaimed = db.session.execute(
+            update(AIJob)
+            .where(AIJob.status == 'running', or_(
+                AIJob.leased_until < now,
+                and_(AIJob.leased_until.is_(None), AIJob.started_at < now - self.lease)
+            ))
+            .values(status='queued', run_after=now, lease_token=None, leased_until=None)
+        ).rowcount
+        AIJob.query.filter(
+            AIJob.status.in_(('done', 'failed')), AIJob.finished_at < now - self.retention
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if reclaimed:
+            with self._stats_lock:
+                self.stats['reclaimed'] += reclaimed
+        return reclaimed
+
+    def _run(self, lanes):
+        idle = True
+        while True:
+            if idle:
+                with self._wake:
+                    self._wake.wait(self.poll_interval)
+            try:
+                with self.app.app_context():
+                    if time.monotonic() - self._last_sweep > self.lease.total_seconds() / 2:
+                        self._last_sweep = time.monotonic()
+                        self.sweep()
+                    claimed = self._claim(lanes)
+                    if claimed is not None:
+                        self._execute(*claimed)
+                idle = claimed is None
+            except Exception:
+                logger.exception('AI job worker error')
+                idle = True
+
+    def get_stats(self):
+        counts = dict(db.session.query(AIJob.status, db.func.count()).filter(
+            AIJob.status.in_(('queued', 'running'))
+        ).group_by(AIJob.status).all())
+        with self._stats_lock:
+            return dict(self.stats, queued=counts.get('queued', 0), running=counts.get('running', 0),
+                        workers=len(self._threads))
+
+job_queue = JobQueue()
@@ -0,0 +1,173 @@
+"""Pluggable LLM backends for the AI endpoints.
+
+Every AI call goes through a backend with complete(messages, max_tokens,
+temperature) and stream(...). OpenAIBackend calls the API; FakeBackend is a
+deterministic local stand-in whose latency and token rate come from a
+profile in LLM_FAKE_PROFILES, so the AI tier can be load-tested and
+benchmarked offline. LLM_BACKEND picks the backend for every endpoint and
+LLM_ROUTES overrides it per endpoint.
+"""
+from collections import namedtuple
+import hashlib
+import json
+import random
+import re
+import time
+import openai
+from ai_streaming import estimate_tokens, fake_completion_stream
+
+class LLMError(Exception):
+    """The model provider rejected a call; carries the HTTP status to return"""
+
+    def __init__(self, message, status, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class Completion(namedtuple('Completion', 'content prompt_tokens completion_tokens')):
+    @property
+    def usage(self):
+        return {
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.prompt_tokens + self.completion_tokens
+        }
+
+def _errors(name):
+    # The v1 SDK exports error classes at the top level, the legacy one in openai.error
+    modules = (openai, getattr(openai, 'error', None))
+    return tuple(getattr(module, name) for module in modules if hasattr(module, name))
+
+AUTH_ERRORS = _errors('AuthenticationError')
+RATE_LIMIT_ERRORS = _errors('RateLimitError')
+
+class OpenAIBackend:
+    """Chat completions from the OpenAI API (v1 client, or the legacy module API)"""
+
+    def __init__(self, model, api_key, timeout=None):
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self._client = None
+
+    def _create(self, **kwargs):
+        try:
+            if hasattr(openai, 'OpenAI'):
+                if self._client is None:
+                    self._client = openai.OpenAI(api_key=self.api_key, timeout=self.timeout)
+                return self._client.chat.completions.create(model=self.model, **kwargs)
+            return openai.ChatCompletion.create(model=self.model, api_key=self.api_key,
+                                                request_timeout=self.timeout, **kwargs)
+        except AUTH_ERRORS:
+            raise LLMError('Invalid API key', 401)
+        except RATE_LIMIT_ERRORS:
+            raise LLMError('Rate limit exceeded', 429)
+
+    def complete(self, messages, max_tokens, temperature):
+        response = self._create(messages=messages, max_tokens=max_tokens, temperature=temperature)
+        return Completion(
+            response.choices[0].message.content,
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens
+        )
+
+    def stream(self, messages, max_tokens, temperature):
+        # A generator, so the request is made (and can fail) inside relay_completion.
+        # include_usage ends the stream with a chunk carrying the real token counts;
+        # the v1 SDK only forwards unknown options through extra_body.
+        options = {'stream_options': {'include_usage': True}}
+        extra = {'extra_body': options} if hasattr(openai, 'OpenAI') else options
+        yield from self._create(messages=messages, max_tokens=max_tokens, temperature=temperature,
+                                stream=True, **extra)
+
+WORDS = ('study', 'concept', 'review', 'example', 'practice', 'summary', 'key', 'idea', 'focus',
+         'question', 'answer', 'topic', 'detail', 'method', 'recall', 'note', 'learn', 'test')
+CARD_REQUEST = re.compile(r'Write (\d+) flashcards')  # the first line of a flashcard_generation prompt
+
+class FakeBackend:
+    """Deterministic stand-in: the same messages always give the same reply and timing.
+
+    A call waits `latency` seconds (give or take `jitter`, as a fraction) before
+    the first token, then produces tokens at `tokens_per_second` (0 means no
+    delay). Replies are between half and all of `reply_tokens`, capped by
+    max_tokens. Flashcard prompts get that many JSON card lines instead, so
+    card generation works end to end offline.
+    """
+
+    def __init__(self, profile, latency=0.0, tokens_per_second=0, reply_tokens=100, jitter=0.0):
+        self.model = f'fake-{profile}'
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.jitter = jitter
+
+    def _plan(self, messages, max_tokens):
+        """Return the reply text and the wait before its first token"""
+        seed = hashlib.blake2b(repr(messages).encode('utf-8'), digest_size=8).digest()
+        rng = random.Random(seed)
+        wait = max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+        cards = CARD_REQUEST.match(messages[-1]['content']) if messages else None
+        if cards:
+            return self._cards(rng, int(cards.group(1)), max_tokens), wait
+        
+        target = max(1, min(max_tokens, rng.randint(self.reply_tokens // 2 or 1, self.reply_tokens)))
+        words = [self.model + ':']
+        while estimate_tokens(' '.join(words)) < target:
+            words.append(rng.choice(WORDS))
+        return ' '.join(words), wait
+
+    def _cards(self, rng, count, max_tokens):
+        lines = []
+        for _ in range(count):
+            card = {
+                'question': f"{self.model} card {rng.randint(1, 10 ** 9)}: {' '.join(rng.choices(WORDS, k=5))}?",
+                'answer': ' '.join(rng.choices(WORDS, k=8))
+            }
+            line = json.dumps(card)
+            if estimate_tokens('\n'.join(lines + [line])) > max_tokens:
+                break
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def complete(self, messages, max_tokens, temperature):
+        reply, wait = self._plan(messages, max_tokens)
+        completion_tokens = estimate_tokens(reply)
+        time.sleep(wait + completion_tokens * self._token_delay())
+        prompt_tokens = sum(estimate_tokens(message['content']) for message in messages)
+        return Completion(reply, prompt_tokens, completion_tokens)
+
+    def stream(self, messages, max_tokens, temperature):
+        reply, wait = self._plan(messages, max_tokens)
+        time.sleep(wait)
+        yield from fake_completion_stream(reply, self._token_delay())
+
+class LLMRouter:
+    """Builds the configured backends and picks one per endpoint"""
+
+    def __init__(self, app=None):
+        self.backends = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        profile = app.config['LLM_FAKE_PROFILE']
+        self.backends = {
+            'openai': OpenAIBackend(app.config['LLM_MODEL'], app.config['OPENAI_API_KEY'],
+                                    app.config['AI_GATEWAY_TIMEOUT']),
+            'fake': FakeBackend(profile, **app.config['LLM_FAKE_PROFILES'][profile])
+        }
+        self.default = app.config['LLM_BACKEND']
+        self.routes = app.config['LLM_ROUTES']
+        for name in [self.default, *self.routes.values()]:
+            if name not in self.backends:
+                raise ValueError(f"Unknown LLM backend {name!r}; expected one of: {', '.join(self.backends)}")
+        app.extensions['llm'] = self
+
+    def for_endpoint(self, endpoint):
+        """The backend serving an AI endpoint, e.g. 'chat' or 'summarize-pdf'"""
+        return self.backends[self.routes.get(endpoint, self.default)]
+
+llm = LLMRouter()
@@ -0,0 +1,95 @@
+from sqlalchemy import inspect, text
+from models import db, DailyStats, StudySession, PomodoroStats, Quiz, Note, note_tags
+from analytics import rebuild
+import search
+import tags
+import quizzes
+
+def dedupe_pomodoro_stats():
+    """Drop duplicate per-day PomodoroStats rows, keeping the newest.
+    
+    Older databases have no unique key on (user_id, date); the stats endpoint
+    overwrote absolute values, so the highest id holds the latest totals.
+    """
+    db.session.execute(text("""
+        DELETE FROM pomodoro_stats
+        WHERE id NOT IN (SELECT MAX(id) FROM pomodoro_stats GROUP BY user_id, date)
+    """))
+    db.session.commit()
+
+def add_missing_columns():
+    """create_all() never alters existing tables; add columns new models declare"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    db.session.commit()
+
+def backfill_next_review():
+    """Cards created before server-side scheduling have no next_review; make them due"""
+    db.session.execute(text("""
+        UPDATE flashcards SET next_review = COALESCE(created_at, CURRENT_TIMESTAMP)
+        WHERE next_review IS NULL
+    """))
+    db.session.commit()
+
+SORT_KEYS = {
+    'flashcard_decks': ['created_at'],
+    'flashcards': ['created_at'],
+    'notes': ['created_at', 'updated_at'],
+    'quizzes': ['created_at'],
+    'mind_maps': ['created_at', 'updated_at'],
+    'conversation_history': ['created_at']
+}
+
+def backfill_sort_keys():
+    """Fill NULL timestamps that list endpoints page on.
+    
+    The keyset predicate (sort_column, id) < (?, ?) never matches a NULL, so
+    such rows would drop out of every page after the first. Older databases
+    declare these columns nullable; new ones create them NOT NULL. Missing
+    timestamps sort as the oldest rows.
+    """
+    for table, columns in SORT_KEYS.items():
+        for column in columns:
+            # created_at comes first in each list, so updated_at can fall back to it
+            value = "'1970-01-01 00:00:00'" if column == 'created_at' else 'created_at'
+            db.session.execute(text(f'UPDATE {table} SET {column} = {value} WHERE {column} IS NULL'))
+    db.session.commit()
+
+def create_missing_indexes():
+    """create_all() only creates indexes for new tables; add any that are missing"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+def backfill_analytics():
+    """Build the analytics rollups once for databases that predate them"""
+    if DailyStats.query.first():
+        return
+    if StudySession.query.first() or PomodoroStats.query.first() or Quiz.query.filter_by(completed=True).first():
+        rebuild()
+
+def backfill_note_tags():
+    """Populate note_tags from the comma-separated Note.tags of databases that predate it"""
+    if db.session.query(note_tags).first():
+        return
+    if Note.query.filter(Note.tags.isnot(None), Note.tags != '').first():
+        tags.backfill()
+
+def run_migrations():
+    """Bring an existing database up to the current models. Safe to run on every start."""
+    add_missing_columns()
+    dedupe_pomodoro_stats()
+    backfill_next_review()
+    backfill_sort_keys()
+    create_missing_indexes()
+    backfill_analytics()
+    backfill_note_tags()
+    search.install()  # before moving quiz questions, so the index picks them up
+    quizzes.backfill_questions()
@@ -0,0 +1,109 @@
+"""JSON-Patch-style operations on mind map data.
+
+Paths are JSON pointers into map_data, e.g. /nodes/<node id>/label. A list
+whose items are objects with an "id" is addressed by id instead of index,
+so /nodes/n7 means the node with id "n7" wherever it sits in the list; other
+lists take an index, or "-" to append. Supported ops are add, replace and
+remove.
+
+Operations are replayed leniently: one that targets something a concurrent
+edit already removed is skipped rather than failing the whole map.
+"""
+
+OPS = ('add', 'replace', 'remove')
+
+class PatchError(ValueError):
+    """Raised for malformed patch operations"""
+
+def _segments(path):
+    if not isinstance(path, str) or not path.startswith('/') or path == '/':
+        raise PatchError(f'Invalid path: {path!r}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in path[1:].split('/')]
+
+def validate_ops(ops, max_ops):
+    """Check the shape of a list of operations"""
+    if not isinstance(ops, list) or not ops:
+        raise PatchError('ops must be a non-empty list')
+    if len(ops) > max_ops:
+        raise PatchError(f'At most {max_ops} operations per patch')
+    for op in ops:
+        if not isinstance(op, dict) or op.get('op') not in OPS:
+            raise PatchError(f"Each operation needs op set to one of: {', '.join(OPS)}")
+        _segments(op.get('path'))
+        if op['op'] != 'remove' and 'value' not in op:
+            raise PatchError(f"{op['op']} {op['path']} needs a value")
+
+def _keyed(items):
+    return bool(items) and all(isinstance(item, dict) and 'id' in item for item in items)
+
+def _find(items, key):
+    """Index of key in a list, or None; '-' is the end of the list"""
+    if key == '-':
+        return len(items)
+    if _keyed(items):
+        return next((i for i, item in enumerate(items) if str(item['id']) == key), None)
+    try:
+        index = int(key)
+    except ValueError:
+        return None
+    return index if 0 <= index <= len(items) else None
+
+def _child(container, key):
+    if isinstance(container, dict):
+        return container.get(key)
+    if isinstance(container, list):
+        index = _find(container, key)
+        return container[index] if index is not None and index < len(container) else None
+    return None
+
+def apply_op(data, op):
+    """Apply one operation in place; returns False if it was skipped"""
+    *parents, key = _segments(op['path'])
+    target = data
+    for depth, part in enumerate(parents):
+        child = _child(target, part)
+        if child is None and op['op'] == 'add' and isinstance(target, dict):
+            # Adding /nodes/<id> to a map without nodes starts the list
+            child = target[part] = [] if depth == len(parents) - 1 else {}
+        if child is None:
+            return False
+        target = child
+
+    kind = op['op']
+    if isinstance(target, dict):
+        if kind == 'remove':
+            return target.pop(key, None) is not None
+        if kind == 'replace' and key not in target:
+            return False
+        target[key] = op['value']
+        return True
+
+    if not isinstance(target, list):
+        return False
+    value = op.get('value')
+    if key != '-' and isinstance(value, dict) and 'id' not in value and _keyed(target):
+        value = {**value, 'id': key}
+    index = _find(target, key)
+    if index is None:
+        # An id-keyed add of a new item appends it
+        if kind == 'add' and (_keyed(target) or not target) and isinstance(value, dict):
+            target.append({**value, 'id': value.get('id', key)})
+            return True
+        return False
+    if kind == 'remove':
+        if index >= len(target):
+            return False
+        del target[index]
+    elif kind == 'replace' or (_keyed(target) and index < len(target)):
+        if index >= len(target):
+            return False
+        target[index] = value
+    else:
+        target.insert(index, value)
+    return True
+
+def apply_ops(data, ops):
+    """Apply operations in order to data (modified in place) and return it"""
+    for op in ops:
+        apply_op(data, op)
+    return data
@@ -0,0 +1,96 @@
+"""Delta updates for mind maps.
+
+MindMap.map_data is a snapshot as of snapshot_version. Each patch bumps the
+map's version with a compare-and-set and is stored as one mind_map_ops row,
+so an edit writes a few hundred bytes instead of the whole map. Reads replay
+the rows after the snapshot; once MINDMAP_COMPACT_OPS have piled up the
+snapshot is rewritten and the replayed rows deleted.
+"""
+import json
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import db, MindMap, MindMapOp
+from mindmap_ops import validate_ops
+
+class VersionConflict(Exception):
+    """The map changed since the version the client patched"""
+
+    def __init__(self, version, ops=None):
+        super().__init__('Mind map was changed by another edit, reload and retry')
+        self.version = version
+        self.ops = ops
+
+def parse_version(value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError('version must be a non-negative integer')
+    return value
+
+def ops_since(mindmap, version):
+    """Patches made after version, or None if they were compacted away"""
+    if version < (mindmap.snapshot_version or 0):
+        return None
+    rows = MindMapOp.query.filter(MindMapOp.map_id == mindmap.id, MindMapOp.version > version) \
+        .order_by(MindMapOp.version).all()
+    return [{'version': row.version, 'ops': json.loads(row.ops)} for row in rows]
+
+def apply_patch(mindmap, version, ops):
+    """Apply ops on top of version and return the new version.
+
+    Raises VersionConflict, carrying the current version and the patches the
+    client is missing, when someone else patched the map first.
+    """
+    validate_ops(ops, current_app.config['MINDMAP_MAX_OPS'])
+
+    updated = MindMap.query.filter(
+        MindMap.id == mindmap.id,
+        func.coalesce(MindMap.version, 0) == version
+    ).update({
+        'version': version + 1,
+        'updated_at': datetime.utcnow()
+    }, synchronize_session=False)
+
+    if updated:
+        db.session.add(MindMapOp(map_id=mindmap.id, version=version + 1, ops=json.dumps(ops, separators=(',', ':'))))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            updated = False
+
+    if not updated:
+        db.session.rollback()
+        db.session.refresh(mindmap)
+        raise VersionConflict(mindmap.version or 0, ops_since(mindmap, version))
+
+    db.session.refresh(mindmap)
+    if mindmap.version - (mindmap.snapshot_version or 0) >= current_app.config['MINDMAP_COMPACT_OPS']:
+        compact(mindmap)
+    return mindmap.version
+
+def compact(mindmap):
+    """Fold the pending patches into map_data and drop them"""
+    version = mindmap.version or 0
+    data = mindmap.current_map_data()
+
+    updated = MindMap.query.filter(
+        MindMap.id == mindmap.id,
+        func.coalesce(MindMap.version, 0) == version
+    ).update({
+        'map_data': json.dumps(data),
+        'snapshot_version': version
+    }, synchronize_session=False)
+    if updated:
+        MindMapOp.query.filter(MindMapOp.map_id == mindmap.id, MindMapOp.version <= version) \
+            .delete(synchronize_session=False)
+    # A patch that won the race leaves its ops in place for the next compaction
+    db.session.commit()
+    db.session.expire(mindmap)
+
+def replace_map_data(mindmap, data):
+    """Overwrite the whole map: a new snapshot with no pending patches"""
+    version = (mindmap.version or 0) + 1
+    mindmap.map_data = json.dumps(data)
+    mindmap.version = version
+    mindmap.snapshot_version = version
+    MindMapOp.query.filter(MindMapOp.map_id == mindmap.id).delete(synchronize_session=False)
@@ -1,12 +1,47 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
+from passwords import password_hasher
+from mindmap_ops import apply_ops
+from sqlalchemy import select, func
 from datetime import datetime
 import json
 
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
-class User(db.Model):
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _clock(value):
+    return value.strftime('%H:%M') if value else None
+
+def _split_tags(value):
+    return value.split(',') if value else []
+
+def _json_dict(value):
+    return json.loads(value) if value else {}
+
+class SerializerMixin:
+    """Declarative to_dict() with optional field projection.
+
+    FIELDS maps each public field name to the column attribute it is read from
+    and an optional formatter. List endpoints use it to load only the columns
+    behind the fields a client asked for.
+    """
+    FIELDS = {}
+    
+    @classmethod
+    def columns_for(cls, fields):
+        """Return the column attributes needed to serialize the given fields"""
+        return [getattr(cls, cls.FIELDS[name][0]) for name in fields]
+    
+    def to_dict(self, fields=None):
+        data = {}
+        for name in fields or self.FIELDS:
+            attr, formatter = self.FIELDS[name]
+            value = getattr(self, attr)
+            data[name] = formatter(value) if formatter else value
+        return data
+
+class User(SerializerMixin, db.Model):
     """User model for authentication and profile"""
     __tablename__ = 'users'
     
@@ -26,27 +61,32 @@ class User(db.Model):
     mind_maps = db.relationship('MindMap', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash and set password (hashing runs in the password worker pool)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verify password"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
     
-    def to_dict(self):
-        """Convert user to dictionary"""
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'full_name': self.full_name,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_login': self.last_login.isoformat() if self.last_login else None
-        }
+    def password_needs_rehash(self):
+        """True when the stored hash uses a different bcrypt cost than configured"""
+        return password_hasher.needs_rehash(self.password_hash)
+    
+    FIELDS = {
+        'id': ('id', None),
+        'username': ('username', None),
+        'email': ('email', None),
+        'full_name': ('full_name', None),
+        'created_at': ('created_at', _isoformat),
+        'last_login': ('last_login', _isoformat)
+    }
 
-class StudySession(db.Model):
+class StudySession(SerializerMixin, db.Model):
     """Study planner sessions"""
     __tablename__ = 'study_sessions'
+    __table_args__ = (
+        db.Index('ix_study_sessions_user_date', 'user_id', 'session_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -58,44 +98,48 @@ class StudySession(db.Model):
     status = db.Column(db.String(20), default='scheduled')  # scheduled, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'subject': self.subject,
-            'date': self.session_date.isoformat() if self.session_date else None,
-            'time': self.session_time.strftime('%H:%M') if self.session_time else None,
-            'duration': self.duration,
-            'goals': self.goals,
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    FIELDS = {
+        'id': ('id', None),
+        'subject': ('subject', None),
+        'date': ('session_date', _isoformat),
+        'time': ('session_time', _clock),
+        'duration': ('duration', None),
+        'goals': ('goals', None),
+        'status': ('status', None),
+        'created_at': ('created_at', _isoformat)
+    }
 
-class FlashcardDeck(db.Model):
+class FlashcardDeck(SerializerMixin, db.Model):
     """Flashcard decks"""
     __tablename__ = 'flashcard_decks'
+    __table_args__ = (
+        db.Index('ix_flashcard_decks_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
     cards = db.relationship('Flashcard', backref='deck', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'card_count': len(self.cards),
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'cards': [card.to_dict() for card in self.cards]
-        }
+    FIELDS = {
+        'id': ('id', None),
+        'name': ('name', None),
+        'description': ('description', None),
+        'card_count': ('card_count', None),
+        'created_at': ('created_at', _isoformat)
+    }
 
-class Flashcard(db.Model):
+class Flashcard(SerializerMixin, db.Model):
     """Individual flashcards"""
     __tablename__ = 'flashcards'
+    __table_args__ = (
+        db.Index('ix_flashcards_deck_created', 'deck_id', 'created_at'),
+        db.Index('ix_flashcards_deck_next_review', 'deck_id', 'next_review'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     deck_id = db.Column(db.Integer, db.ForeignKey('flashcard_decks.id'), nullable=False)
@@ -103,98 +147,214 @@ class Flashcard(db.Model):
     answer = db.Column(db.Text, nullable=False)
     difficulty = db.Column(db.String(20), default='medium')
     last_reviewed = db.Column(db.DateTime)
-    next_review = db.Column(db.DateTime)
+    next_review = db.Column(db.DateTime, default=datetime.utcnow)  # new cards are due immediately
     review_count = db.Column(db.Integer, default=0)
     correct_count = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    ease_factor = db.Column(db.Float, default=2.5)  # SM-2 easiness
+    interval = db.Column(db.Integer, default=0)  # in days
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'question': self.question,
-            'answer': self.answer,
-            'difficulty': self.difficulty,
-            'last_reviewed': self.last_reviewed.isoformat() if self.last_reviewed else None,
-            'next_review': self.next_review.isoformat() if self.next_review else None,
-            'review_count': self.review_count,
-            'correct_count': self.correct_count
-        }
+    FIELDS = {
+        'id': ('id', None),
+        'question': ('question', None),
+        'answer': ('answer', None),
+        'difficulty': ('difficulty', None),
+        'last_reviewed': ('last_reviewed', _isoformat),
+        'next_review': ('next_review', _isoformat),
+        'review_count': ('review_count', None),
+        'correct_count': ('correct_count', None),
+        'ease_factor': ('ease_factor', None),
+        'interval': ('interval', None)
+    }
+
+# Card count as a correlated COUNT subquery, so deck listings get counts in the
+# same SELECT instead of loading every deck's cards. Deferred so single-deck
+# lookups don't pay for it; list queries undefer it.
+FlashcardDeck.card_count = db.column_property(
+    select(func.count(Flashcard.id))
+    .where(Flashcard.deck_id == FlashcardDeck.id)
+    .correlate_except(Flashcard)
+    .scalar_subquery(),
+    deferred=True
+)
+
+note_tags = db.Table(
+    'note_tags',
+    db.Column('note_id', db.Integer, db.ForeignKey('notes.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_note_tags_tag_note', 'tag_id', 'note_id')
+)
+
+class Tag(db.Model):
+    """A user's note tag"""
+    __tablename__ = 'tags'
+    __table_args__ = (
+        db.Index('uq_tags_user_name', 'user_id', 'name', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
 
-class Note(db.Model):
+class Note(SerializerMixin, db.Model):
     """User notes"""
     __tablename__ = 'notes'
+    __table_args__ = (
+        db.Index('ix_notes_user_updated', 'user_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    tags = db.Column(db.String(500))  # Comma-separated tags
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    tags = db.Column(db.String(500))  # Comma-separated copy of tag_list for serialization
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'tags': self.tags.split(',') if self.tags else [],
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    tag_list = db.relationship('Tag', secondary=note_tags, lazy=True)
+    
+    FIELDS = {
+        'id': ('id', None),
+        'title': ('title', None),
+        'content': ('content', None),
+        'tags': ('tags', _split_tags),
+        'created_at': ('created_at', _isoformat),
+        'updated_at': ('updated_at', _isoformat)
+    }
 
-class Quiz(db.Model):
+class Quiz(SerializerMixin, db.Model):
     """User quizzes"""
     __tablename__ = 'quizzes'
+    __table_args__ = (
+        db.Index('ix_quizzes_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     topic = db.Column(db.String(100))
     difficulty = db.Column(db.String(20))
-    questions_data = db.Column(db.Text)  # JSON string of questions
+    questions_data = db.Column(db.Text)  # legacy JSON blob, moved to quiz_questions on startup
     score = db.Column(db.Integer)
-    max_score = db.Column(db.Integer)
+    max_score = db.Column(db.Integer)  # number of questions
     completed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    questions = db.relationship('QuizQuestion', backref='quiz', lazy=True, cascade='all, delete-orphan',
+                                order_by='QuizQuestion.position')
+    
+    FIELDS = {
+        'id': ('id', None),
+        'title': ('title', None),
+        'topic': ('topic', None),
+        'difficulty': ('difficulty', None),
+        'score': ('score', None),
+        'max_score': ('max_score', None),
+        'completed': ('completed', None),
+        'created_at': ('created_at', _isoformat)
+    }
+
+class QuizQuestion(db.Model):
+    """One question of a quiz, with answer statistics"""
+    __tablename__ = 'quiz_questions'
+    __table_args__ = (
+        db.Index('ix_quiz_questions_quiz_position', 'quiz_id', 'position'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+    question = db.Column(db.Text, nullable=False)
+    data = db.Column(db.Text)  # JSON of the question as submitted (options, correct answer, ...)
+    attempt_count = db.Column(db.Integer, default=0)
+    correct_count = db.Column(db.Integer, default=0)
+    last_answered = db.Column(db.DateTime)
     
     def to_dict(self):
         return {
+            **_json_dict(self.data),
             'id': self.id,
-            'title': self.title,
-            'topic': self.topic,
-            'difficulty': self.difficulty,
-            'questions': json.loads(self.questions_data) if self.questions_data else [],
-            'score': self.score,
-            'max_score': self.max_score,
-            'completed': self.completed,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'position': self.position,
+            'question': self.question,
+            'attempt_count': self.attempt_count or 0,
+            'correct_count': self.correct_count or 0,
+            'last_answered': _isoformat(self.last_answered)
         }
 
-class MindMap(db.Model):
+class MindMap(SerializerMixin, db.Model):
     """User mind maps"""
     __tablename__ = 'mind_maps'
+    __table_args__ = (
+        db.Index('ix_mind_maps_user_updated', 'user_id', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
-    map_data = db.Column(db.Text)  # JSON string of nodes and connections
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    map_data = db.Column(db.Text)  # JSON snapshot of nodes and connections as of snapshot_version
+    version = db.Column(db.Integer, default=0)  # bumped by every edit
+    snapshot_version = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'map_data': json.loads(self.map_data) if self.map_data else {},
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # Patches applied since the snapshot
+    ops = db.relationship('MindMapOp', lazy=True, cascade='all, delete-orphan')
+    
+    FIELDS = {
+        'id': ('id', None),
+        'title': ('title', None),
+        'description': ('description', None),
+        'map_data': ('map_data', None),
+        'version': ('version', None),
+        'created_at': ('created_at', _isoformat),
+        'updated_at': ('updated_at', _isoformat)
+    }
+    
+    @classmethod
+    def columns_for(cls, fields):
+        columns = super().columns_for(fields)
+        if 'map_data' in fields:
+            columns += [cls.version, cls.snapshot_version]
+        return columns
+    
+    def current_map_data(self):
+        """The snapshot with the patches made after it replayed"""
+        data = _json_dict(self.map_data)
+        snapshot_version = self.snapshot_version or 0
+        if (self.version or 0) > snapshot_version:
+            for row in sorted(self.ops, key=lambda row: row.version):
+                if row.version > snapshot_version:
+                    apply_ops(data, json.loads(row.ops))
+        return data
+    
+    def to_dict(self, fields=None):
+        data = super().to_dict(fields)
+        if 'map_data' in data:
+            data['map_data'] = self.current_map_data()
+        if 'version' in data:
+            data['version'] = data['version'] or 0
+        return data
+
+class MindMapOp(db.Model):
+    """One patch to a mind map, kept until the map's snapshot is compacted past it"""
+    __tablename__ = 'mind_map_ops'
+    __table_args__ = (
+        db.Index('uq_mind_map_ops_map_version', 'map_id', 'version', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    map_id = db.Column(db.Integer, db.ForeignKey('mind_maps.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)  # map version this patch produced
+    ops = db.Column(db.Text, nullable=False)  # compact JSON list of operations
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class PomodoroStats(db.Model):
     """Pomodoro timer statistics"""
     __tablename__ = 'pomodoro_stats'
+    __table_args__ = (
+        db.Index('uq_pomodoro_stats_user_date', 'user_id', 'date', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -209,20 +369,243 @@ class PomodoroStats(db.Model):
             'date': self.date.isoformat() if self.date else None
         }
 
-class ConversationHistory(db.Model):
+class PomodoroEvent(db.Model):
+    """Client id of an applied pomodoro increment, so a replayed offline event counts once"""
+    __tablename__ = 'pomodoro_events'
+    __table_args__ = (
+        db.Index('uq_pomodoro_events_user_event', 'user_id', 'event_id', unique=True),
+        db.Index('ix_pomodoro_events_created', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_id = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ConversationHistory(SerializerMixin, db.Model):
     """AI Assistant conversation history"""
     __tablename__ = 'conversation_history'
+    __table_args__ = (
+        db.Index('ix_conversation_history_user_created', 'user_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # user, assistant
     content = db.Column(db.Text, nullable=False)
+    tokens = db.Column(db.Integer)  # estimated prompt tokens of content
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    FIELDS = {
+        'id': ('id', None),
+        'role': ('role', None),
+        'content': ('content', None),
+        'created_at': ('created_at', _isoformat)
+    }
+
+class ConversationSummary(db.Model):
+    """Rolling summary of conversation turns that no longer fit the context window"""
+    __tablename__ = 'conversation_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    covers_until_id = db.Column(db.Integer, nullable=False)  # last ConversationHistory id folded in
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Document(db.Model):
+    """Extracted text of an uploaded file, stored once per distinct content"""
+    __tablename__ = 'documents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the file bytes
+    extension = db.Column(db.String(10), nullable=False)
+    size = db.Column(db.Integer, nullable=False)  # in bytes
+    status = db.Column(db.String(20), default='pending')  # pending, ready, failed
+    text = db.Column(db.Text)
+    error = db.Column(db.Text)
+    queued_at = db.Column(db.DateTime)  # when extraction was last handed to a worker
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'size': self.size,
+            'status': self.status,
+            'error': self.error,
+            'text_length': len(self.text) if self.text else 0,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class Upload(db.Model):
+    """A user's upload of a document"""
+    __tablename__ = 'uploads'
+    __table_args__ = (
+        db.Index('ix_uploads_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    document = db.relationship('Document', lazy='joined')
+    
     def to_dict(self):
         return {
             'id': self.id,
-            'role': self.role,
-            'content': self.content,
+            'filename': self.filename,
+            'document': self.document.to_dict() if self.document else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class DailyStats(db.Model):
+    """Per-user, per-day activity rollup maintained on write by analytics.py"""
+    __tablename__ = 'daily_stats'
+    __table_args__ = (
+        db.Index('uq_daily_stats_user_day', 'user_id', 'day', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    focus_time = db.Column(db.Integer, default=0)  # pomodoro focus, in seconds
+    pomodoro_sessions = db.Column(db.Integer, default=0)
+    planned_sessions = db.Column(db.Integer, default=0)  # study sessions not cancelled
+    completed_sessions = db.Column(db.Integer, default=0)
+    study_minutes = db.Column(db.Integer, default=0)  # duration of completed sessions
+    quiz_attempts = db.Column(db.Integer, default=0)
+    quiz_score = db.Column(db.Integer, default=0)
+    quiz_max_score = db.Column(db.Integer, default=0)
+    
+    def is_active(self):
+        return bool(self.focus_time or self.pomodoro_sessions or self.completed_sessions or self.quiz_attempts)
+    
+    def to_dict(self):
+        return {
+            'date': self.day.isoformat(),
+            'focus_time': self.focus_time or 0,
+            'pomodoro_sessions': self.pomodoro_sessions or 0,
+            'planned_sessions': self.planned_sessions or 0,
+            'completed_sessions': self.completed_sessions or 0,
+            'study_minutes': self.study_minutes or 0,
+            'quiz_attempts': self.quiz_attempts or 0,
+            'quiz_score': self.quiz_score or 0,
+            'quiz_max_score': self.quiz_max_score or 0
+        }
+
+class SubjectStats(db.Model):
+    """Per-user, per-subject study session rollup"""
+    __tablename__ = 'subject_stats'
+    __table_args__ = (
+        db.Index('uq_subject_stats_user_subject', 'user_id', 'subject', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    planned_sessions = db.Column(db.Integer, default=0)
+    completed_sessions = db.Column(db.Integer, default=0)
+    study_minutes = db.Column(db.Integer, default=0)
+    
+    def to_dict(self):
+        return {
+            'subject': self.subject,
+            'planned_sessions': self.planned_sessions or 0,
+            'completed_sessions': self.completed_sessions or 0,
+            'study_minutes': self.study_minutes or 0
+        }
+
+class StudyStreak(db.Model):
+    """Consecutive active days, kept current as DailyStats rows change"""
+    __tablename__ = 'study_streaks'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    current = db.Column(db.Integer, default=0)  # run ending on last_active
+    longest = db.Column(db.Integer, default=0)
+    last_active = db.Column(db.Date)
+
+class CollectionVersion(db.Model):
+    """Per-user change counter of a collection, the source of its ETags"""
+    __tablename__ = 'collection_versions'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    collection = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime)
+
+class AIUsage(db.Model):
+    """One upstream AI call, written in batches by usage.py"""
+    __tablename__ = 'ai_usage'
+    __table_args__ = (
+        db.Index('ix_ai_usage_user_created', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    endpoint = db.Column(db.String(40), nullable=False)
+    model = db.Column(db.String(60), nullable=False)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class AIUsageDaily(db.Model):
+    """Per-user, per-day token totals of each endpoint and model"""
+    __tablename__ = 'ai_usage_daily'
+    __table_args__ = (
+        db.Index('uq_ai_usage_daily_user_day', 'user_id', 'day', 'endpoint', 'model', unique=True),
+        db.Index('ix_ai_usage_daily_day', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    endpoint = db.Column(db.String(40), nullable=False)
+    model = db.Column(db.String(60), nullable=False)
+    calls = db.Column(db.Integer, default=0)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+
+class AIJob(db.Model):
+    """A queued AI request, run in the background by jobs.py"""
+    __tablename__ = 'ai_jobs'
+    __table_args__ = (
+        db.Index('ix_ai_jobs_queue', 'status', 'lane', 'id'),
+        db.Index('ix_ai_jobs_user_status', 'user_id', 'status'),
+        db.Index('uq_ai_jobs_user_idempotency_key', 'user_id', 'idempotency_key', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    endpoint = db.Column(db.String(40), nullable=False)
+    lane = db.Column(db.String(20), nullable=False)  # interactive, bulk
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    idempotency_key = db.Column(db.String(255))
+    params = db.Column(db.Text, nullable=False)  # JSON handler arguments
+    result = db.Column(db.Text)  # JSON response body
+    error = db.Column(db.Text)
+    error_status = db.Column(db.Integer)  # HTTP status the request would have failed with
+    attempts = db.Column(db.Integer, default=0)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)  # not claimed before this (retry backoff)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    lease_token = db.Column(db.String(32))  # set while a worker holds the job
+    leased_until = db.Column(db.DateTime)  # renewed by the worker; past it the job is requeued
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'lane': self.lane,
+            'status': self.status,
+            'attempts': self.attempts or 0,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'error_status': self.error_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,100 @@
+from flask import current_app, request
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+from datetime import date, datetime
+import base64
+import json
+
+class PaginationError(ValueError):
+    """Raised for malformed cursor, limit or fields parameters"""
+
+def encode_cursor(sort_value, row_id):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    if isinstance(sort_value, (date, datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor, sort_column=None):
+    """Decode a cursor back into a (sort_value, id) pair.
+    
+    Without a sort_column the sort value is returned as decoded from JSON.
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        python_type = sort_column.type.python_type if sort_column is not None else None
+        if python_type is datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        elif python_type is date:
+            sort_value = date.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+def parse_fields(model):
+    """Read the fields= projection from the query string"""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in model.FIELDS]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def parse_limit():
+    """Read the page size from the query string, clamped to MAX_PAGE_SIZE"""
+    default = current_app.config['DEFAULT_PAGE_SIZE']
+    try:
+        limit = int(request.args.get('limit', default))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, current_app.config['MAX_PAGE_SIZE'])
+
+def paginate(query, model, sort_column, descending=True):
+    """Return one page of query, newest-first unless descending is False.
+    
+    Pages are keyed on (sort_column, id) rather than OFFSET so the cost of a
+    page does not grow with how deep the client has scrolled. sort_column
+    must be NOT NULL, since a NULL never satisfies the keyset comparison.
+    When fields= is given only the columns behind those fields are loaded.
+    
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    fields = parse_fields(model)
+    limit = parse_limit()
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        if descending:
+            query = query.filter(or_(
+                sort_column < sort_value,
+                and_(sort_column == sort_value, model.id < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                sort_column > sort_value,
+                and_(sort_column == sort_value, model.id > row_id)
+            ))
+    
+    if fields:
+        columns = model.columns_for(fields) + [model.id, sort_column]
+        query = query.options(load_only(*columns))
+    
+    if descending:
+        query = query.order_by(sort_column.desc(), model.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), model.id.asc())
+    rows = query.limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    
+    return [row.to_dict(fields) for row in rows], next_cursor
@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+import bcrypt
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _check(password_hash, password):
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+class HasherBusy(Exception):
+    """No hashing slot became free within PASSWORD_HASH_WAIT seconds"""
+
+class PasswordHasher:
+    """bcrypt in a bounded process pool.
+    
+    bcrypt is CPU-bound, so hashing on request threads lets a burst of logins
+    pin every web worker. Work is sent to PASSWORD_HASH_WORKERS processes; at
+    most PASSWORD_HASH_QUEUE calls may wait for them, and a caller that cannot
+    get a slot in PASSWORD_HASH_WAIT seconds gets HasherBusy. The bcrypt cost
+    is BCRYPT_LOG_ROUNDS, and hashes at another cost are reported by
+    needs_rehash() so they can be upgraded at login.
+    """
+    
+    def __init__(self, app=None):
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+        self.wait = app.config['PASSWORD_HASH_WAIT']
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE'])
+        app.extensions['password_hasher'] = self
+    
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Not fork: a child forked while another thread holds a lock inherits it locked
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+    
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise HasherBusy('Server is busy, try again shortly')
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+    
+    def hash(self, password):
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        return self._run(_hash, password, self.rounds)
+    
+    def check(self, password_hash, password):
+        if not password_hash or not password:
+            return False
+        return self._run(_check, password_hash, password)
+    
+    def needs_rehash(self, password_hash):
+        """True when the hash was made with a different cost than BCRYPT_LOG_ROUNDS"""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+password_hasher = PasswordHasher()
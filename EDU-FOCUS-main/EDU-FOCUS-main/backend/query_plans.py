@@ -0,0 +1,129 @@
+"""Query-plan regression check for the per-user hot paths.
+
+Drives the study list endpoints against an in-memory SQLite database, runs
+EXPLAIN QUERY PLAN on every SELECT they issue and exits non-zero if any of
+them falls back to a full table scan, a temporary sort or a per-row probe
+that should have been a single range read.
+
+    python query_plans.py
+"""
+import os
+import sys
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['AI_JOB_WORKERS_AUTOSTART'] = 'false'
+
+from sqlalchemy import event
+from app import create_app
+from models import db
+
+# (label, endpoint) pairs; {deck_id} and {cursor} are filled in at run time
+HOT_PATHS = [
+    ('sessions', '/api/study/sessions?limit=2'),
+    ('sessions page 2', '/api/study/sessions?limit=2&cursor={sessions_cursor}'),
+    ('decks', '/api/study/flashcards/decks'),
+    ('deck cards', '/api/study/flashcards/decks/{deck_id}/cards?limit=2'),
+    ('deck cards page 2', '/api/study/flashcards/decks/{deck_id}/cards?limit=2&cursor={cards_cursor}'),
+    ('due cards', '/api/study/flashcards/due'),
+    ('notes', '/api/study/notes?fields=id,title'),
+    ('notes by tag', '/api/study/notes?tag=tag'),
+    ('note tags', '/api/study/notes/tags'),
+    ('quizzes', '/api/study/quizzes'),
+    ('mind maps', '/api/study/mindmaps'),
+    ('pomodoro stats', '/api/study/pomodoro/stats'),
+    ('chat history', '/api/ai/chat/history'),
+    ('analytics', '/api/study/analytics?days=30'),
+]
+
+# Paths that merge several index ranges and may sort the merged rows. The due
+# queue reads each deck's (deck_id, next_review) range, so the sort only sees
+# the user's due cards. Analytics and the tag facet sort one row per subject
+# or tag of the user.
+TEMP_SORT_ALLOWED = {'due cards', 'analytics', 'note tags'}
+
+# Index probes that run once per outer row. Filtering notes by tag must read
+# the tag's note_tags rows once, not look up note_tags for every note.
+PER_ROW_PROBES = ('SEARCH note_tags USING COVERING INDEX sqlite_autoindex_note_tags_1',)
+
+def plan_problems(plan_rows, allow_temp_sort=False):
+    """Return the plan lines that indicate a full scan, a temp-table sort or a per-row probe"""
+    problems = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'CONSTANT ROW' not in detail:
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail and not allow_temp_sort:
+            problems.append(detail)
+        elif detail.startswith(PER_ROW_PROBES):
+            problems.append(detail)
+    return problems
+
+def seed(client, headers):
+    """Create a few rows in every collection so each hot path returns data"""
+    for i in range(3):
+        client.post('/api/study/sessions', headers=headers,
+                    json={'subject': f'Subject {i}', 'date': f'2026-01-0{i + 1}', 'time': '09:00'})
+        client.post('/api/study/notes', headers=headers,
+                    json={'title': f'Note {i}', 'content': 'content', 'tags': ['tag']})
+        client.post('/api/study/quizzes', headers=headers,
+                    json={'title': f'Quiz {i}', 'questions': []})
+        client.post('/api/study/mindmaps', headers=headers, json={'title': f'Map {i}'})
+    
+    deck = client.post('/api/study/flashcards/decks', headers=headers, json={'name': 'Deck'}).get_json()['deck']
+    for i in range(3):
+        client.post(f"/api/study/flashcards/decks/{deck['id']}/cards", headers=headers,
+                    json={'question': f'Q{i}', 'answer': f'A{i}'})
+    client.post('/api/study/pomodoro/stats', headers=headers, json={'sessions_completed': 1})
+    return deck['id']
+
+def run():
+    app = create_app()
+    client = app.test_client()
+    
+    token = client.post('/api/auth/register', json={
+        'username': 'planner', 'email': 'planner@example.com', 'password': 'password'
+    }).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    
+    params = {'deck_id': seed(client, headers)}
+    params['sessions_cursor'] = client.get('/api/study/sessions?limit=2', headers=headers).get_json()['next_cursor']
+    params['cards_cursor'] = client.get(
+        f"/api/study/flashcards/decks/{params['deck_id']}/cards?limit=2", headers=headers
+    ).get_json()['next_cursor']
+    
+    captured = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+    
+    failures = 0
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        for label, endpoint in HOT_PATHS:
+            captured.clear()
+            response = client.get(endpoint.format(**params), headers=headers)
+            if response.status_code != 200:
+                print(f'FAIL {label}: HTTP {response.status_code}')
+                failures += 1
+                continue
+            
+            statements = list(captured)
+            with engine.connect() as conn:
+                for statement, parameters in statements:
+                    plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                    problems = plan_problems(plan, label in TEMP_SORT_ALLOWED)
+                    if problems:
+                        failures += 1
+                        print(f'FAIL {label}: {"; ".join(problems)}\n    {" ".join(statement.split())}')
+                    else:
+                        print(f'ok   {label}: {"; ".join(row[-1] for row in plan)}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    
+    return failures
+
+if __name__ == '__main__':
+    sys.exit(1 if run() else 0)
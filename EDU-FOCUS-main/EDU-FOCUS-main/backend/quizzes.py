@@ -0,0 +1,100 @@
+"""Quiz questions stored one row per question.
+
+Quizzes used to keep every question in the Quiz.questions_data JSON blob,
+which listing had to parse for every quiz. Questions now live in
+quiz_questions and are only loaded for a single quiz.
+"""
+from datetime import datetime
+from sqlalchemy import bindparam, func, update
+from models import db, Quiz, QuizQuestion
+import json
+
+def question_values(quiz_id, questions):
+    """Insert values for a list of questions given as strings or objects.
+    
+    Objects keep all their keys in `data`; the text comes from "question"
+    (AI generated) or "q" (quiz page).
+    """
+    rows = []
+    for position, question in enumerate(questions):
+        if isinstance(question, dict):
+            text = question.get('question') or question.get('q')
+            data = json.dumps(question)
+        else:
+            text, data = question, None
+        if not text or not str(text).strip():
+            raise ValueError(f'Question {position + 1} has no text')
+        rows.append({
+            'quiz_id': quiz_id,
+            'position': position,
+            'question': str(text),
+            'data': data,
+            'attempt_count': 0,
+            'correct_count': 0
+        })
+    return rows
+
+def add_questions(quiz_id, questions):
+    """Insert a quiz's questions with one executemany"""
+    rows = question_values(quiz_id, questions)
+    if rows:
+        db.session.execute(db.insert(QuizQuestion), rows)
+    return len(rows)
+
+def record_answers(quiz_id, answers):
+    """Count one attempt per answered question; returns how many were correct.
+    
+    answers is a list of {'question_id', 'correct'}. A question answered twice
+    raises ValueError, so a client cannot score one question more than once;
+    ids outside the quiz are ignored. Counters are bumped in SQL with one
+    executemany.
+    """
+    correct = {}
+    for answer in answers:
+        question_id = int(answer['question_id'])
+        if question_id in correct:
+            raise ValueError(f'Question {question_id} is answered more than once')
+        correct[question_id] = 1 if answer.get('correct') else 0
+    
+    rows = []
+    if correct:
+        known = {question_id for (question_id,) in db.session.query(QuizQuestion.id).filter_by(quiz_id=quiz_id)}
+        rows = [{'question_id': question_id, 'correct': value} for question_id, value in correct.items() if question_id in known]
+    if rows:
+        table = QuizQuestion.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('question_id'), table.c.quiz_id == quiz_id)
+            .values(
+                attempt_count=func.coalesce(table.c.attempt_count, 0) + 1,
+                correct_count=func.coalesce(table.c.correct_count, 0) + bindparam('correct'),
+                last_answered=datetime.utcnow()
+            ),
+            rows
+        )
+    return sum(row['correct'] for row in rows)
+
+def backfill_questions():
+    """Move questions out of the legacy questions_data blobs"""
+    quizzes = db.session.query(Quiz.id, Quiz.questions_data).filter(Quiz.questions_data.isnot(None)).all()
+    for quiz_id, questions_data in quizzes:
+        try:
+            questions = json.loads(questions_data)
+        except ValueError:
+            questions = []
+        rows = []
+        if isinstance(questions, list):
+            for position, question in enumerate(questions):
+                try:
+                    rows.extend(question_values(quiz_id, [question]))
+                except ValueError:
+                    continue
+                rows[-1]['position'] = position
+        if rows:
+            db.session.execute(db.insert(QuizQuestion), rows)
+    if quizzes:
+        db.session.execute(
+            update(Quiz).where(Quiz.questions_data.isnot(None)).values(questions_data=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
@@ -0,0 +1,64 @@
+import threading
+import time
+
+class TokenBucketLimiter:
+    """In-memory token buckets keyed by string (e.g. client IP or username).
+    
+    Each key may burst up to capacity attempts and regains refill_per_minute
+    tokens per minute. State is per process, which is enough to blunt
+    credential stuffing against a single worker's share of traffic.
+    """
+    
+    def __init__(self, capacity, refill_per_minute, max_keys=10000):
+        self.capacity = capacity
+        self.rate = refill_per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def _prune(self, now):
+        # Drop buckets that have refilled completely; they carry no state
+        full = [key for key, (tokens, updated) in self._buckets.items()
+                if tokens + (now - updated) * self.rate >= self.capacity]
+        for key in full:
+            del self._buckets[key]
+    
+    def consume(self, key):
+        """Take one token for key. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False, int((1 - tokens) / self.rate) + 1
+            
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return True, 0
+
+class LoginLimiter:
+    """Per-username attempt limits for the login endpoint, plus a looser per-IP cap"""
+    
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.enabled = app.config['LOGIN_RATE_LIMIT_ENABLED']
+        self.per_ip = TokenBucketLimiter(*app.config['LOGIN_RATE_PER_IP'])
+        self.per_username = TokenBucketLimiter(*app.config['LOGIN_RATE_PER_USERNAME'])
+        app.extensions['login_limiter'] = self
+    
+    def check(self, ip, username):
+        """Returns (allowed, retry_after_seconds) and consumes an attempt from both buckets"""
+        if not self.enabled:
+            return True, 0
+        allowed, retry_after = self.per_username.consume(username.lower())
+        if not allowed:
+            return False, retry_after
+        return self.per_ip.consume(ip)
+
+login_limiter = LoginLimiter()
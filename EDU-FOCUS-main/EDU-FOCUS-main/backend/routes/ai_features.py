@@ -1,60 +1,231 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import openai
-import os
+from ai_cache import response_cache, make_key
+from semantic_cache import semantic_cache
+from ai_streaming import relay_completion
+from ai_gateway import ai_gateway, GatewayError
+from llm import llm, LLMError
+from usage import usage_ledger, usage_by_endpoint, MeteredBackend
+from jobs import job_queue
+from summarizer import condense
+from routes.uploads import uploaded_text
+from flashcard_generation import DeckNotFound, card_prompts, unique_cards
+from bulk import bulk_import, card_values
+from versions import touch
+from conversation import build_messages, record_turn, compact
+from models import db, ConversationHistory, ConversationSummary, AIJob, FlashcardDeck, Flashcard
+from pagination import paginate, PaginationError
+from functools import partial, wraps
+from datetime import datetime, timedelta
 
 ai_bp = Blueprint('ai', __name__)
 
-# Configure OpenAI
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+def gateway_error(error):
+    """JSON response for a rejected or timed-out gateway call, or a failed upstream one"""
+    response = jsonify({'error': str(error)})
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status
+
+def admin_required(view):
+    """Restrict a view to the users in ADMIN_USER_IDS; use below @jwt_required()"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if int(get_jwt_identity()) not in current_app.config['ADMIN_USER_IDS']:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def backend_for(endpoint):
+    """The current user's metered backend for an endpoint; raises QuotaExceeded when today's tokens are spent"""
+    user_id = get_jwt_identity()
+    usage_ledger.check(user_id)
+    return MeteredBackend(llm.for_endpoint(endpoint), user_id, endpoint)
+
+def _complete(backend, prompt, max_tokens, temperature, cache_key=None):
+    content = backend.complete([{"role": "user", "content": prompt}], max_tokens, temperature).content
+    if cache_key:
+        response_cache.set(cache_key, content)
+    return content
+
+def _cached_complete(backend, prompt, max_tokens, temperature):
+    key = make_key(backend.model, prompt, max_tokens, temperature)
+    content = response_cache.get(key)
+    if content is None:
+        content = _complete(backend, prompt, max_tokens, temperature, cache_key=key)
+    return content
+
+def condense_material(backend, text, instruction):
+    """Map-reduce long material down to one prompt's worth of text.
+    
+    Chunk summaries run in parallel through the gateway and are cached per
+    chunk, so re-submitting an edited document only re-summarizes the chunks
+    that changed. Text that already fits is returned unchanged.
+    """
+    max_tokens = current_app.config['AI_CHUNK_SUMMARY_TOKENS']
+    parallelism = current_app.config['AI_SUMMARY_PARALLELISM']
+    
+    def summarize_all(prompts):
+        args = [(backend, prompt, max_tokens, 0.3) for prompt in prompts]
+        return ai_gateway.map(backend.user_id, _cached_complete, args, parallelism)
+    
+    return condense(text, summarize_all, current_app.config['AI_CHUNK_TOKENS'], instruction)
+
+def gateway_completion(backend, prompt, max_tokens, temperature):
+    """Single-prompt completion through the gateway; identical in-flight prompts share one call"""
+    key = make_key(backend.model, prompt, max_tokens, temperature)
+    return ai_gateway.call(backend.user_id, key, _complete, backend, prompt, max_tokens, temperature)
+
+def cached_completion(backend, prompt, max_tokens, temperature):
+    """Like gateway_completion, but served from the response cache when possible"""
+    key = make_key(backend.model, prompt, max_tokens, temperature)
+    content = response_cache.get(key)
+    if content is not None:
+        return content
+    
+    return ai_gateway.call(backend.user_id, key, _complete, backend, prompt, max_tokens, temperature,
+                           cache_key=key)
+
+def semantic_completion(complete, backend, kind, text, prompt, max_tokens, temperature):
+    """Run `complete` unless a near-duplicate of `text` was already answered for the same kind of prompt"""
+    namespace = f'{kind}:{backend.model}:{max_tokens}:{temperature}'
+    content = semantic_cache.get(namespace, text)
+    if content is not None:
+        return content
+    
+    content = complete(backend, prompt, max_tokens, temperature)
+    semantic_cache.set(namespace, text, content)
+    return content
+
+def sessions_bucket(sessions):
+    """Coarse session count, so recommendations for 7 and 8 sessions can share an answer"""
+    try:
+        sessions = int(sessions)
+    except (TypeError, ValueError):
+        return 'unknown'
+    for limit, label in ((0, '0'), (2, '1-2'), (5, '3-5'), (10, '6-10'), (20, '11-20')):
+        if sessions <= limit:
+            return label
+    return '21+'
+
+def respond(endpoint, generate, status=200, **params):
+    """Answer with generate(backend, **params), or queue it as a job if the request sets "async": true.
+    
+    A queued job is answered with 202 and its id; GET /jobs/<id> has the result.
+    Retries carrying the same Idempotency-Key get the existing job back.
+    """
+    backend = backend_for(endpoint)
+    if not request.get_json().get('async'):
+        return jsonify(generate(backend, **params)), status
+    
+    job, created = job_queue.submit(backend.user_id, endpoint, params, request.headers.get('Idempotency-Key'))
+    response = jsonify({'job': job.to_dict()})
+    response.headers['Location'] = url_for('ai.get_job', job_id=job.id)
+    return response, 202 if created else 200
+
+def chat_reply(backend, message):
+    """One non-streamed chat turn: reply from the model, then store it with the history"""
+    user_id = backend.user_id
+    
+    # Context comes from stored history, trimmed to the token budget
+    messages, needs_compaction = build_messages(user_id, message)
+    completion = ai_gateway.call(user_id, None, backend.complete, messages, 1000, 0.7)
+    
+    finish_chat_turn(user_id, message, completion.content, needs_compaction, backend)
+    
+    return {'reply': completion.content, 'usage': completion.usage}
+
+def finish_chat_turn(user_id, message, reply, needs_compaction, backend):
+    """Store the exchange and, if old turns fell out of the window, fold them into the summary"""
+    record_turn(user_id, message, reply)
+    if needs_compaction:
+        app = current_app._get_current_object()
+        summarize = partial(_complete, backend, temperature=0.3)
+        try:
+            ai_gateway.submit(user_id, f'compact:{user_id}', compact, app, user_id, summarize)
+        except GatewayError:
+            pass  # user is at their limit; compaction is retried after the next turn
 
 @ai_bp.route('/chat', methods=['POST'])
 @jwt_required()
 def chat():
-    """AI Assistant chat endpoint"""
+    """AI Assistant chat endpoint; set stream=true for Server-Sent Events or async=true for a job"""
     try:
+        user_id = get_jwt_identity()
         data = request.get_json()
         message = data.get('message')
-        conversation_history = data.get('history', [])
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
-        # Prepare messages for OpenAI
-        messages = [
-            {"role": "system", "content": "You are a helpful AI study assistant. Help students with their studies, answer questions, and provide educational support."}
-        ]
-        
-        # Add conversation history
-        messages.extend(conversation_history[-10:])  # Keep last 10 messages for context
-        messages.append({"role": "user", "content": message})
-        
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=messages,
-            max_tokens=1000,
-            temperature=0.7
+        if not data.get('stream'):
+            return respond('chat', chat_reply, message=message)
+        
+        backend = backend_for('chat')
+        
+        # Context comes from stored history, trimmed to the token budget
+        messages, needs_compaction = build_messages(user_id, message)
+        
+        def on_complete(reply, usage, interrupted):
+            if interrupted and not reply:
+                return  # the upstream call failed before generating anything
+            backend.record(usage['prompt_tokens'], usage['completion_tokens'])
+            # A cut-off reply is charged but kept out of the history the next turns build on
+            if not interrupted:
+                finish_chat_turn(user_id, message, reply, needs_compaction, backend)
+        
+        def relay():
+            yield from relay_completion(
+                backend.stream(messages, 1000, 0.7), messages,
+                on_complete=on_complete
+            )
+        
+        ai_gateway.acquire(user_id)
+        response = Response(
+            stream_with_context(relay()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
         )
+        # The server closes the response even if the client leaves before the body is read
+        response.call_on_close(lambda: ai_gateway.release(user_id))
+        return response
         
-        reply = response.choices[0].message.content
-        
-        return jsonify({
-            'reply': reply,
-            'usage': {
-                'prompt_tokens': response.usage.prompt_tokens,
-                'completion_tokens': response.usage.completion_tokens,
-                'total_tokens': response.usage.total_tokens
-            }
-        }), 200
-        
-    except openai.error.AuthenticationError:
-        return jsonify({'error': 'Invalid API key'}), 401
-    except openai.error.RateLimitError:
-        return jsonify({'error': 'Rate limit exceeded'}), 429
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/chat/history', methods=['GET'])
+@jwt_required()
+def get_chat_history():
+    """Get a page of stored chat messages, newest first"""
+    try:
+        user_id = get_jwt_identity()
+        query = ConversationHistory.query.filter_by(user_id=user_id)
+        messages, next_cursor = paginate(query, ConversationHistory, ConversationHistory.created_at)
+        return jsonify({'messages': messages, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/chat/history', methods=['DELETE'])
+@jwt_required()
+def clear_chat_history():
+    """Delete stored chat messages and the rolling summary"""
+    try:
+        user_id = get_jwt_identity()
+        ConversationHistory.query.filter_by(user_id=user_id).delete()
+        ConversationSummary.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+        return jsonify({'message': 'Chat history cleared'}), 200
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def video_summary(backend, prompt):
+    return {'summary': cached_completion(backend, prompt, max_tokens=500, temperature=0.5)}
+
 @ai_bp.route('/summarize-video', methods=['POST'])
 @jwt_required()
 def summarize_video():
@@ -76,35 +247,19 @@ Provide:
 2. Key points (3-5 bullet points)
 3. Main takeaways"""
         
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.5
-        )
-        
-        summary = response.choices[0].message.content
-        
-        return jsonify({'summary': summary}), 200
+        return respond('summarize-video', video_summary, prompt=prompt)
         
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@ai_bp.route('/summarize-pdf', methods=['POST'])
-@jwt_required()
-def summarize_pdf():
-    """PDF summarizer endpoint"""
-    try:
-        data = request.get_json()
-        text = data.get('text', '')
-        
-        if not text:
-            return jsonify({'error': 'PDF text is required'}), 400
-        
-        # Limit text length to avoid token limits
-        text = text[:4000]
-        
-        prompt = f"""Summarize this document:
+def pdf_summary(backend, text):
+    # Long documents are summarized chunk by chunk to fit the prompt
+    text = condense_material(backend, text, "Summarize this section of a document. "
+                                            "Keep its key concepts, definitions and important details:")
+    
+    prompt = f"""Summarize this document:
 
 {text}
 
@@ -113,21 +268,36 @@ Provide:
 2. Key concepts (3-5 points)
 3. Important details
 4. Conclusion"""
+    
+    return {'summary': cached_completion(backend, prompt, max_tokens=800, temperature=0.5)}
+
+@ai_bp.route('/summarize-pdf', methods=['POST'])
+@jwt_required()
+def summarize_pdf():
+    """PDF summarizer endpoint; accepts extracted `text` or an `upload_id`"""
+    try:
+        data = request.get_json()
+        text = data.get('text', '')
         
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.5
-        )
+        if data.get('upload_id'):
+            text, error = uploaded_text(get_jwt_identity(), data['upload_id'])
+            if error:
+                return error
         
-        summary = response.choices[0].message.content
+        if not text:
+            return jsonify({'error': 'PDF text is required'}), 400
         
-        return jsonify({'summary': summary}), 200
+        return respond('summarize-pdf', pdf_summary, text=text)
         
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def recommendations(backend, kind, subjects, prompt):
+    content = semantic_completion(gateway_completion, backend, kind, subjects, prompt, max_tokens=500, temperature=0.7)
+    return {'recommendations': content}
+
 @ai_bp.route('/recommendations', methods=['POST'])
 @jwt_required()
 def get_recommendations():
@@ -146,20 +316,20 @@ def get_recommendations():
 
 Provide 3-5 personalized study recommendations to improve their learning."""
         
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        recommendations = response.choices[0].message.content
-        
-        return jsonify({'recommendations': recommendations}), 200
+        kind = f"recommendations:{performance_data.get('focus_level', 'N/A')}:{sessions_bucket(performance_data.get('sessions', 0))}"
+        subjects = ' '.join(sorted(str(subject) for subject in study_history))
+        return respond('recommendations', recommendations, kind=kind, subjects=subjects, prompt=prompt)
         
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def study_guide(backend, topic, guide_format, kind, prompt):
+    guide = semantic_completion(cached_completion, backend, f'study-guide:{kind}', topic, prompt,
+                                max_tokens=1500, temperature=0.7)
+    return {'guide': guide, 'topic': topic, 'format': guide_format}
+
 @ai_bp.route('/study-guide', methods=['POST'])
 @jwt_required()
 def generate_study_guide():
@@ -179,66 +349,222 @@ def generate_study_guide():
             'mindmap': 'Outline main concepts and their relationships in a hierarchical structure.'
         }
         
-        instruction = format_instructions.get(guide_format, format_instructions['comprehensive'])
+        kind = guide_format if guide_format in format_instructions else 'comprehensive'
+        instruction = format_instructions[kind]
         
         prompt = f"""Topic: {topic}
 
 {instruction}"""
         
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=1500,
-            temperature=0.7
-        )
-        
-        guide = response.choices[0].message.content
-        
-        return jsonify({'guide': guide, 'topic': topic, 'format': guide_format}), 200
+        return respond('study-guide', study_guide, topic=topic, guide_format=guide_format, kind=kind, prompt=prompt)
         
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@ai_bp.route('/analyze-material', methods=['POST'])
+def flashcard_deck(backend, topic, content, count, deck_id, deck_name, difficulty):
+    """Generate cards in parallel batches, then insert them (and a new deck if asked) in one transaction"""
+    user_id = backend.user_id
+    if content:
+        content = condense_material(backend, content, "Extract the facts, definitions and concepts worth "
+                                                      "memorizing from this section of study material:")
+    
+    prompts = card_prompts(count, current_app.config['AI_FLASHCARD_BATCH'], topic, content)
+    args = [(backend, prompt, max_tokens, 0.5) for prompt, max_tokens in prompts]
+    replies = ai_gateway.map(user_id, _cached_complete, args, current_app.config['AI_FLASHCARD_PARALLELISM'])
+    cards = unique_cards(replies, count)
+    if not cards:
+        raise LLMError('The model returned no usable flashcards', 502)
+    
+    if deck_id:
+        deck = FlashcardDeck.query.filter_by(id=deck_id, user_id=user_id).first()
+        if not deck:
+            raise DeckNotFound('Deck not found')
+    else:
+        deck = FlashcardDeck(user_id=user_id, name=deck_name, description=f'Generated from {topic or "study material"}')
+        db.session.add(deck)
+        db.session.flush()
+    
+    touch(user_id, 'flashcards')
+    rows = ((number, dict(card, difficulty=difficulty), None) for number, card in enumerate(cards, start=1))
+    created, _, _ = bulk_import(Flashcard, rows, lambda row: card_values(row, deck.id))
+    
+    return {'deck': deck.to_dict(), 'created': created, 'requested': count, 'cards': cards}
+
+@ai_bp.route('/flashcards', methods=['POST'])
 @jwt_required()
-def analyze_material():
-    """Analyze uploaded study material"""
+def generate_flashcards():
+    """Generate `count` flashcards for a `topic`, `content` or `upload_id` into a deck in one request"""
     try:
+        user_id = get_jwt_identity()
         data = request.get_json()
+        topic = (data.get('topic') or '').strip()
         content = data.get('content', '')
-        question = data.get('question', '')
         
-        if not content:
-            return jsonify({'error': 'Material content is required'}), 400
-        
-        # Limit content length
-        content = content[:3000]
+        if data.get('upload_id'):
+            content, error = uploaded_text(user_id, data['upload_id'])
+            if error:
+                return error
+        
+        if not topic and not content:
+            return jsonify({'error': 'Topic or material is required'}), 400
+        
+        count = data.get('count', 10)
+        max_count = current_app.config['AI_FLASHCARD_MAX']
+        if not isinstance(count, int) or not 1 <= count <= max_count:
+            return jsonify({'error': f'count must be between 1 and {max_count}'}), 400
+        
+        # Cards go into an existing deck, or a new one named deck_name (default: the topic)
+        deck_id = data.get('deck_id')
+        deck_name = (data.get('deck_name') or topic)[:100]
+        if deck_id:
+            if not FlashcardDeck.query.filter_by(id=deck_id, user_id=user_id).first():
+                return jsonify({'error': 'Deck not found'}), 404
+        elif not deck_name:
+            return jsonify({'error': 'deck_id or deck_name is required'}), 400
+        
+        return respond('flashcards', flashcard_deck, status=201, topic=topic, content=content, count=count,
+                       deck_id=deck_id, deck_name=deck_name, difficulty=data.get('difficulty', 'medium'))
+        
+    except DeckNotFound as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 404
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/gateway/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def gateway_stats():
+    """Gateway admission and coalescing counters"""
+    return jsonify({'gateway': ai_gateway.get_stats()}), 200
+
+@ai_bp.route('/usage', methods=['GET'])
+@jwt_required()
+def get_usage():
+    """The current user's token usage per endpoint over the last ?days= days, and today's quota"""
+    try:
+        user_id = get_jwt_identity()
+        days = request.args.get('days', 30, type=int)
+        if not 1 <= days <= 366:
+            return jsonify({'error': 'days must be between 1 and 366'}), 400
+        
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        used = usage_ledger.used_today(user_id)
+        quota = usage_ledger.quota
+        remaining = max(0, quota - used) if quota is not None else None
+        return jsonify({
+            'today': {'used': used, 'quota': quota, 'remaining': remaining},
+            'endpoints': usage_by_endpoint(since, user_id, current_app.config['AI_TOKEN_PRICES'])
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/usage/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def usage_stats():
+    """Token usage and estimated cost per endpoint across all users, plus ledger counters"""
+    try:
+        days = request.args.get('days', 7, type=int)
+        if not 1 <= days <= 366:
+            return jsonify({'error': 'days must be between 1 and 366'}), 400
         
-        if question:
-            prompt = f"""Based on this study material:
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        return jsonify({
+            'endpoints': usage_by_endpoint(since, prices=current_app.config['AI_TOKEN_PRICES']),
+            'ledger': usage_ledger.get_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def cache_stats():
+    """Response cache and near-duplicate cache hit/miss counters"""
+    return jsonify({'cache': response_cache.get_stats(), 'semantic': semantic_cache.get_stats()}), 200
+
+@ai_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Status of a queued AI request, with its result once done"""
+    try:
+        job = AIJob.query.filter_by(id=job_id, user_id=get_jwt_identity()).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        response = jsonify({'job': job.to_dict()})
+        if job.status in ('queued', 'running'):
+            response.headers['Retry-After'] = str(current_app.config['AI_JOB_POLL_INTERVAL'])
+        return response, 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ai_bp.route('/jobs/stats', methods=['GET'])
+@jwt_required()
+@admin_required
+def job_stats():
+    """Job queue counters and current queue depth"""
+    try:
+        return jsonify({'jobs': job_queue.get_stats()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def material_analysis(backend, content, question):
+    # Long material is summarized chunk by chunk to fit the prompt
+    if question:
+        instruction = (f"Extract the facts and definitions from this section of study material "
+                       f"that are relevant to the question: {question}")
+    else:
+        instruction = "Summarize this section of study material, keeping its main topics and key concepts:"
+    content = condense_material(backend, content, instruction)
+    
+    if question:
+        prompt = f"""Based on this study material:
 
 {content}
 
 Answer this question: {question}"""
-        else:
-            prompt = f"""Analyze this study material and provide:
+    else:
+        prompt = f"""Analyze this study material and provide:
 1. Main topics covered
 2. Key concepts
 3. Summary
 
 Material:
 {content}"""
+    
+    return {'analysis': cached_completion(backend, prompt, max_tokens=800, temperature=0.5)}
+
+@ai_bp.route('/analyze-material', methods=['POST'])
+@jwt_required()
+def analyze_material():
+    """Analyze study material given as `content` or an `upload_id`"""
+    try:
+        data = request.get_json()
+        content = data.get('content', '')
+        question = data.get('question', '')
         
-        response = openai.ChatCompletion.create(
-            model='gpt-3.5-turbo',
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=800,
-            temperature=0.5
-        )
+        if data.get('upload_id'):
+            content, error = uploaded_text(get_jwt_identity(), data['upload_id'])
+            if error:
+                return error
         
-        analysis = response.choices[0].message.content
+        if not content:
+            return jsonify({'error': 'Material content is required'}), 400
         
-        return jsonify({'analysis': analysis}), 200
+        return respond('analyze-material', material_analysis, content=content, question=question)
         
+    except (GatewayError, LLMError) as e:
+        return gateway_error(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+for endpoint, handler in (('chat', chat_reply), ('summarize-video', video_summary), ('summarize-pdf', pdf_summary),
+                          ('recommendations', recommendations), ('study-guide', study_guide),
+                          ('analyze-material', material_analysis), ('flashcards', flashcard_deck)):
+    job_queue.register(endpoint, handler)
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, current_user
 from models import db, User
+from passwords import HasherBusy
+from rate_limit import login_limiter
+from user_cache import user_cache
+from versions import touch, conditional
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -12,8 +16,10 @@ def register():
         data = request.get_json()
         
         # Validate input
-        if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+        if not isinstance(data, dict) or not data.get('username') or not data.get('email') or not data.get('password'):
             return jsonify({'error': 'Missing required fields'}), 400
+        if not all(isinstance(data[field], str) for field in ('username', 'email', 'password')):
+            return jsonify({'error': 'username, email and password must be strings'}), 400
         
         # Check if user already exists
         if User.query.filter_by(username=data['username']).first():
@@ -44,6 +50,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -55,8 +64,16 @@ def login():
         data = request.get_json()
         
         # Validate input
-        if not data or not data.get('username') or not data.get('password'):
+        if not isinstance(data, dict) or not data.get('username') or not data.get('password'):
             return jsonify({'error': 'Missing username or password'}), 400
+        if not isinstance(data['username'], str) or not isinstance(data['password'], str):
+            return jsonify({'error': 'username and password must be strings'}), 400
+        
+        allowed, retry_after = login_limiter.check(request.remote_addr or 'unknown', data['username'])
+        if not allowed:
+            response = jsonify({'error': 'Too many login attempts, try again later'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
         
         # Find user
         user = User.query.filter_by(username=data['username']).first()
@@ -64,9 +81,15 @@ def login():
         if not user or not user.check_password(data['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade hashes made with an older bcrypt cost
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+        
         # Update last login
         user.last_login = datetime.utcnow()
+        touch(user.id, 'profile')
         db.session.commit()
+        user_cache.invalidate(user.id)
         
         # Generate tokens
         access_token = create_access_token(identity=user.id)
@@ -79,6 +102,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HasherBusy as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -95,16 +120,11 @@ def refresh():
 
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
+@conditional('profile')
 def get_current_user():
-    """Get current user info"""
+    """Get current user info (served from the user cache)"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        return jsonify({'user': user.to_dict()}), 200
+        return jsonify({'user': current_user.to_dict()}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -113,8 +133,8 @@ def get_current_user():
 def update_profile():
     """Update user profile"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        current_user_id = current_user.id
+        user = db.session.get(User, current_user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -134,13 +154,18 @@ def update_profile():
         if data.get('new_password'):
             user.set_password(data['new_password'])
         
+        touch(current_user_id, 'profile')
         db.session.commit()
+        user_cache.invalidate(current_user_id)
         
         return jsonify({
             'message': 'Profile updated successfully',
             'user': user.to_dict()
         }), 200
         
+    except HasherBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -1,20 +1,49 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, StudySession, FlashcardDeck, Flashcard, Note, Quiz, MindMap, PomodoroStats
+from pagination import paginate, parse_fields, parse_limit, encode_cursor, decode_cursor, PaginationError
+from scheduler import record_review, due_cards, parse_quality
+from bulk import read_rows, bulk_import, export_ndjson, card_values, note_values, session_values
+from analytics import increment_rows, claim_events, prune_events, session_snapshot, track_sessions, track_pomodoro, quiz_snapshot, track_quiz, summary, MAX_DAYS
+from sqlalchemy.orm import undefer, selectinload
+import search
+from tags import clean_tags, set_note_tags, with_tag, tag_counts
+from quizzes import add_questions, record_answers
+from versions import touch, conditional
+from mindmaps import apply_patch, replace_map_data, parse_version, VersionConflict
+from mindmap_ops import PatchError
 from datetime import datetime, date
 import json
 
 study_bp = Blueprint('study', __name__)
 
+def import_response(model, to_values, on_batch=None):
+    """Run a bulk import of the request body and report per-row errors"""
+    rows = read_rows(request.stream, request.content_type)
+    imported, errors, error_count = bulk_import(model, rows, to_values, on_batch)
+    return jsonify({
+        'message': f'Imported {imported} rows',
+        'imported': imported,
+        'failed': error_count,
+        'errors': errors
+    }), 200
+
+def ndjson_response(query, serialize=None):
+    return Response(stream_with_context(export_ndjson(query, serialize)), mimetype='application/x-ndjson')
+
 # ==================== Study Sessions ====================
 @study_bp.route('/sessions', methods=['GET'])
 @jwt_required()
+@conditional('sessions')
 def get_sessions():
-    """Get all study sessions for current user"""
+    """Get a page of study sessions for current user"""
     try:
         user_id = get_jwt_identity()
-        sessions = StudySession.query.filter_by(user_id=user_id).order_by(StudySession.session_date.desc()).all()
-        return jsonify({'sessions': [s.to_dict() for s in sessions]}), 200
+        query = StudySession.query.filter_by(user_id=user_id)
+        sessions, next_cursor = paginate(query, StudySession, StudySession.session_date)
+        return jsonify({'sessions': sessions, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -37,6 +66,8 @@ def create_session():
         )
         
         db.session.add(session)
+        track_sessions(user_id, after=[session_snapshot(session)])
+        touch(user_id, 'sessions', 'analytics')
         db.session.commit()
         
         return jsonify({'message': 'Session created', 'session': session.to_dict()}), 201
@@ -44,6 +75,31 @@ def create_session():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/sessions/import', methods=['POST'])
+@jwt_required()
+def import_sessions():
+    """Bulk import study sessions from an NDJSON or CSV body"""
+    try:
+        user_id = get_jwt_identity()
+        touch(user_id, 'sessions', 'analytics')
+        return import_response(
+            StudySession,
+            lambda row: session_values(row, user_id),
+            on_batch=lambda batch, ids: track_sessions(user_id, after=batch)
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/sessions/export', methods=['GET'])
+@jwt_required()
+@conditional('sessions')
+def export_sessions():
+    """Stream all study sessions as NDJSON"""
+    user_id = get_jwt_identity()
+    query = StudySession.query.filter_by(user_id=user_id).order_by(StudySession.id)
+    return ndjson_response(query)
+
 @study_bp.route('/sessions/<int:session_id>', methods=['PUT'])
 @jwt_required()
 def update_session(session_id):
@@ -56,6 +112,7 @@ def update_session(session_id):
             return jsonify({'error': 'Session not found'}), 404
         
         data = request.get_json()
+        before = session_snapshot(session)
         
         if data.get('subject'):
             session.subject = data['subject']
@@ -70,6 +127,8 @@ def update_session(session_id):
         if data.get('status'):
             session.status = data['status']
         
+        track_sessions(user_id, before=[before], after=[session_snapshot(session)])
+        touch(user_id, 'sessions', 'analytics')
         db.session.commit()
         
         return jsonify({'message': 'Session updated', 'session': session.to_dict()}), 200
@@ -88,7 +147,9 @@ def delete_session(session_id):
         if not session:
             return jsonify({'error': 'Session not found'}), 404
         
+        track_sessions(user_id, before=[session_snapshot(session)])
         db.session.delete(session)
+        touch(user_id, 'sessions', 'analytics')
         db.session.commit()
         
         return jsonify({'message': 'Session deleted'}), 200
@@ -99,12 +160,16 @@ def delete_session(session_id):
 # ==================== Flashcards ====================
 @study_bp.route('/flashcards/decks', methods=['GET'])
 @jwt_required()
+@conditional('flashcards')
 def get_decks():
-    """Get all flashcard decks"""
+    """Get a page of deck summaries; cards are fetched per deck"""
     try:
         user_id = get_jwt_identity()
-        decks = FlashcardDeck.query.filter_by(user_id=user_id).order_by(FlashcardDeck.created_at.desc()).all()
-        return jsonify({'decks': [d.to_dict() for d in decks]}), 200
+        query = FlashcardDeck.query.filter_by(user_id=user_id).options(undefer(FlashcardDeck.card_count))
+        decks, next_cursor = paginate(query, FlashcardDeck, FlashcardDeck.created_at)
+        return jsonify({'decks': decks, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -123,6 +188,7 @@ def create_deck():
         )
         
         db.session.add(deck)
+        touch(user_id, 'flashcards')
         db.session.commit()
         
         return jsonify({'message': 'Deck created', 'deck': deck.to_dict()}), 201
@@ -142,6 +208,7 @@ def delete_deck(deck_id):
             return jsonify({'error': 'Deck not found'}), 404
         
         db.session.delete(deck)
+        touch(user_id, 'flashcards')
         db.session.commit()
         
         return jsonify({'message': 'Deck deleted'}), 200
@@ -149,6 +216,26 @@ def delete_deck(deck_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/flashcards/decks/<int:deck_id>/cards', methods=['GET'])
+@jwt_required()
+@conditional('flashcards')
+def get_cards(deck_id):
+    """Get a page of cards in a deck, oldest first"""
+    try:
+        user_id = get_jwt_identity()
+        deck = FlashcardDeck.query.filter_by(id=deck_id, user_id=user_id).first()
+        
+        if not deck:
+            return jsonify({'error': 'Deck not found'}), 404
+        
+        query = Flashcard.query.filter_by(deck_id=deck_id)
+        cards, next_cursor = paginate(query, Flashcard, Flashcard.created_at, descending=False)
+        return jsonify({'cards': cards, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @study_bp.route('/flashcards/decks/<int:deck_id>/cards', methods=['POST'])
 @jwt_required()
 def add_card(deck_id):
@@ -170,6 +257,7 @@ def add_card(deck_id):
         )
         
         db.session.add(card)
+        touch(user_id, 'flashcards')
         db.session.commit()
         
         return jsonify({'message': 'Card added', 'card': card.to_dict()}), 201
@@ -177,6 +265,34 @@ def add_card(deck_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/flashcards/decks/<int:deck_id>/cards/import', methods=['POST'])
+@jwt_required()
+def import_cards(deck_id):
+    """Bulk import cards into a deck from an NDJSON or CSV body"""
+    try:
+        user_id = get_jwt_identity()
+        deck = FlashcardDeck.query.filter_by(id=deck_id, user_id=user_id).first()
+        
+        if not deck:
+            return jsonify({'error': 'Deck not found'}), 404
+        
+        touch(user_id, 'flashcards')
+        return import_response(Flashcard, lambda row: card_values(row, deck_id))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/flashcards/decks/export', methods=['GET'])
+@jwt_required()
+@conditional('flashcards')
+def export_cards():
+    """Stream every card in the user's decks as NDJSON, tagged with its deck"""
+    user_id = get_jwt_identity()
+    query = db.session.query(Flashcard, FlashcardDeck.name).join(FlashcardDeck).filter(
+        FlashcardDeck.user_id == user_id
+    ).order_by(Flashcard.deck_id, Flashcard.id)
+    return ndjson_response(query, lambda row: dict(row[0].to_dict(), deck_id=row[0].deck_id, deck=row[1]))
+
 @study_bp.route('/flashcards/cards/<int:card_id>', methods=['DELETE'])
 @jwt_required()
 def delete_card(card_id):
@@ -192,6 +308,7 @@ def delete_card(card_id):
             return jsonify({'error': 'Card not found'}), 404
         
         db.session.delete(card)
+        touch(user_id, 'flashcards')
         db.session.commit()
         
         return jsonify({'message': 'Card deleted'}), 200
@@ -199,15 +316,66 @@ def delete_card(card_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/flashcards/cards/<int:card_id>/review', methods=['POST'])
+@jwt_required()
+def review_card(card_id):
+    """Record a review and reschedule the card"""
+    try:
+        user_id = get_jwt_identity()
+        card = Flashcard.query.join(FlashcardDeck).filter(
+            Flashcard.id == card_id,
+            FlashcardDeck.user_id == user_id
+        ).first()
+        
+        if not card:
+            return jsonify({'error': 'Card not found'}), 404
+        
+        try:
+            quality = parse_quality(request.get_json() or {})
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        touch(user_id, 'flashcards')
+        card = record_review(card_id, quality)
+        
+        return jsonify({'message': 'Review recorded', 'card': card.to_dict()}), 200
+    except RuntimeError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/flashcards/due', methods=['GET'])
+@jwt_required()
+def get_due_cards():
+    """Get the next cards due for review across all decks"""
+    try:
+        user_id = get_jwt_identity()
+        limit = request.args.get('limit', current_app.config['DUE_CARDS_LIMIT'], type=int)
+        limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+        
+        cards = due_cards(user_id, limit)
+        return jsonify({'cards': [dict(c.to_dict(), deck_id=c.deck_id) for c in cards]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ==================== Notes ====================
 @study_bp.route('/notes', methods=['GET'])
 @jwt_required()
+@conditional('notes')
 def get_notes():
-    """Get all notes"""
+    """Get a page of notes, optionally only those tagged ?tag="""
     try:
         user_id = get_jwt_identity()
-        notes = Note.query.filter_by(user_id=user_id).order_by(Note.updated_at.desc()).all()
-        return jsonify({'notes': [n.to_dict() for n in notes]}), 200
+        query = Note.query.filter_by(user_id=user_id)
+        tag = request.args.get('tag', '').strip()
+        if tag:
+            query = with_tag(query, user_id, tag)
+        notes, next_cursor = paginate(query, Note, Note.updated_at)
+        return jsonify({'notes': notes, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -218,15 +386,19 @@ def create_note():
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
+        tags = clean_tags(data.get('tags', []))
         
         note = Note(
             user_id=user_id,
             title=data['title'],
             content=data['content'],
-            tags=','.join(data.get('tags', []))
+            tags=','.join(tags)
         )
         
         db.session.add(note)
+        db.session.flush()
+        set_note_tags(user_id, {note.id: tags})
+        touch(user_id, 'notes')
         db.session.commit()
         
         return jsonify({'message': 'Note created', 'note': note.to_dict()}), 201
@@ -234,6 +406,44 @@ def create_note():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/notes/tags', methods=['GET'])
+@jwt_required()
+@conditional('notes')
+def get_note_tags():
+    """Tags on the user's notes with the number of notes carrying each"""
+    try:
+        user_id = get_jwt_identity()
+        return jsonify({'tags': tag_counts(user_id)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/notes/import', methods=['POST'])
+@jwt_required()
+def import_notes():
+    """Bulk import notes from an NDJSON or CSV body"""
+    try:
+        user_id = get_jwt_identity()
+        touch(user_id, 'notes')
+        return import_response(
+            Note,
+            lambda row: note_values(row, user_id),
+            on_batch=lambda batch, ids: set_note_tags(
+                user_id, {note_id: clean_tags(row['tags']) for note_id, row in zip(ids, batch)}
+            )
+        )
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/notes/export', methods=['GET'])
+@jwt_required()
+@conditional('notes')
+def export_notes():
+    """Stream all notes as NDJSON"""
+    user_id = get_jwt_identity()
+    query = Note.query.filter_by(user_id=user_id).order_by(Note.id)
+    return ndjson_response(query)
+
 @study_bp.route('/notes/<int:note_id>', methods=['PUT'])
 @jwt_required()
 def update_note(note_id):
@@ -252,9 +462,12 @@ def update_note(note_id):
         if data.get('content'):
             note.content = data['content']
         if 'tags' in data:
-            note.tags = ','.join(data['tags'])
+            tags = clean_tags(data['tags'])
+            note.tags = ','.join(tags)
+            set_note_tags(user_id, {note.id: tags})
         
         note.updated_at = datetime.utcnow()
+        touch(user_id, 'notes')
         db.session.commit()
         
         return jsonify({'message': 'Note updated', 'note': note.to_dict()}), 200
@@ -274,6 +487,7 @@ def delete_note(note_id):
             return jsonify({'error': 'Note not found'}), 404
         
         db.session.delete(note)
+        touch(user_id, 'notes')
         db.session.commit()
         
         return jsonify({'message': 'Note deleted'}), 200
@@ -284,12 +498,16 @@ def delete_note(note_id):
 # ==================== Quizzes ====================
 @study_bp.route('/quizzes', methods=['GET'])
 @jwt_required()
+@conditional('quizzes')
 def get_quizzes():
-    """Get all quizzes"""
+    """Get a page of quizzes"""
     try:
         user_id = get_jwt_identity()
-        quizzes = Quiz.query.filter_by(user_id=user_id).order_by(Quiz.created_at.desc()).all()
-        return jsonify({'quizzes': [q.to_dict() for q in quizzes]}), 200
+        query = Quiz.query.filter_by(user_id=user_id)
+        quizzes, next_cursor = paginate(query, Quiz, Quiz.created_at)
+        return jsonify({'quizzes': quizzes, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -300,24 +518,49 @@ def create_quiz():
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
+        questions = data.get('questions', [])
         
         quiz = Quiz(
             user_id=user_id,
             title=data['title'],
             topic=data.get('topic'),
             difficulty=data.get('difficulty'),
-            questions_data=json.dumps(data.get('questions', [])),
-            max_score=len(data.get('questions', []))
+            max_score=len(questions)
         )
         
         db.session.add(quiz)
+        db.session.flush()
+        add_questions(quiz.id, questions)
+        touch(user_id, 'quizzes')
         db.session.commit()
         
         return jsonify({'message': 'Quiz created', 'quiz': quiz.to_dict()}), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/quizzes/<int:quiz_id>', methods=['GET'])
+@jwt_required()
+@conditional('quizzes')
+def get_quiz(quiz_id):
+    """Get a quiz with its questions"""
+    try:
+        user_id = get_jwt_identity()
+        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        return jsonify({
+            'quiz': quiz.to_dict(),
+            'questions': [question.to_dict() for question in quiz.questions]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @study_bp.route('/quizzes/<int:quiz_id>', methods=['DELETE'])
 @jwt_required()
 def delete_quiz(quiz_id):
@@ -329,7 +572,9 @@ def delete_quiz(quiz_id):
         if not quiz:
             return jsonify({'error': 'Quiz not found'}), 404
         
+        track_quiz(user_id, quiz_snapshot(quiz), None)
         db.session.delete(quiz)
+        touch(user_id, 'quizzes', 'analytics')
         db.session.commit()
         
         return jsonify({'message': 'Quiz deleted'}), 200
@@ -337,15 +582,62 @@ def delete_quiz(quiz_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@study_bp.route('/quizzes/<int:quiz_id>/submit', methods=['POST'])
+@jwt_required()
+def submit_quiz(quiz_id):
+    """Record a scored attempt at a quiz.
+    
+    Accepts a score, per-question answers ([{question_id, correct}]) or both;
+    without a score, the number of correct answers is the score.
+    """
+    try:
+        user_id = get_jwt_identity()
+        quiz = Quiz.query.filter_by(id=quiz_id, user_id=user_id).first()
+        
+        if not quiz:
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        data = request.get_json() or {}
+        correct = record_answers(quiz.id, data.get('answers', []))
+        score = int(data['score'] if 'score' in data or 'answers' not in data else correct)
+        if score < 0 or (quiz.max_score is not None and score > quiz.max_score):
+            return jsonify({'error': 'score must be between 0 and max_score'}), 400
+        
+        before = quiz_snapshot(quiz)
+        quiz.score = score
+        quiz.completed = True
+        track_quiz(user_id, before, quiz_snapshot(quiz))
+        touch(user_id, 'quizzes', 'analytics')
+        db.session.commit()
+        
+        return jsonify({'message': 'Quiz submitted', 'quiz': quiz.to_dict()}), 200
+    except KeyError:
+        db.session.rollback()
+        return jsonify({'error': 'score or answers [{question_id, correct}] is required'}), 400
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 # ==================== Mind Maps ====================
 @study_bp.route('/mindmaps', methods=['GET'])
 @jwt_required()
+@conditional('mindmaps')
 def get_mindmaps():
-    """Get all mind maps"""
+    """Get a page of mind maps"""
     try:
         user_id = get_jwt_identity()
-        maps = MindMap.query.filter_by(user_id=user_id).order_by(MindMap.updated_at.desc()).all()
-        return jsonify({'maps': [m.to_dict() for m in maps]}), 200
+        query = MindMap.query.filter_by(user_id=user_id)
+        fields = parse_fields(MindMap)
+        if fields is None or 'map_data' in fields:
+            # Pending patches are only replayed into map_data
+            query = query.options(selectinload(MindMap.ops))
+        maps, next_cursor = paginate(query, MindMap, MindMap.updated_at)
+        return jsonify({'maps': maps, 'next_cursor': next_cursor}), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -365,6 +657,7 @@ def create_mindmap():
         )
         
         db.session.add(mindmap)
+        touch(user_id, 'mindmaps')
         db.session.commit()
         
         return jsonify({'message': 'Mind map created', 'map': mindmap.to_dict()}), 201
@@ -385,17 +678,52 @@ def update_mindmap(map_id):
         
         data = request.get_json()
         
+        if 'version' in data and parse_version(data['version']) != (mindmap.version or 0):
+            return jsonify({'error': 'Mind map was changed by another edit, reload and retry',
+                            'version': mindmap.version or 0}), 409
         if data.get('title'):
             mindmap.title = data['title']
         if data.get('description'):
             mindmap.description = data['description']
         if 'map_data' in data:
-            mindmap.map_data = json.dumps(data['map_data'])
+            replace_map_data(mindmap, data['map_data'])
         
         mindmap.updated_at = datetime.utcnow()
+        touch(user_id, 'mindmaps')
         db.session.commit()
         
         return jsonify({'message': 'Mind map updated', 'map': mindmap.to_dict()}), 200
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/mindmaps/<int:map_id>', methods=['PATCH'])
+@jwt_required()
+def patch_mindmap(map_id):
+    """Apply node and edge operations to the version of a mind map the client has"""
+    try:
+        user_id = get_jwt_identity()
+        mindmap = MindMap.query.filter_by(id=map_id, user_id=user_id).first()
+        
+        if not mindmap:
+            return jsonify({'error': 'Mind map not found'}), 404
+        
+        data = request.get_json()
+        touch(user_id, 'mindmaps')
+        version = apply_patch(mindmap, parse_version(data['version']), data['ops'])
+        
+        return jsonify({'message': 'Mind map updated', 'version': version}), 200
+    except KeyError:
+        return jsonify({'error': 'version and ops are required'}), 400
+    except VersionConflict as e:
+        # ops is None when the client's version was compacted away: reload the map
+        return jsonify({'error': str(e), 'version': e.version, 'ops': e.ops}), 409
+    except (PatchError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -412,6 +740,7 @@ def delete_mindmap(map_id):
             return jsonify({'error': 'Mind map not found'}), 404
         
         db.session.delete(mindmap)
+        touch(user_id, 'mindmaps')
         db.session.commit()
         
         return jsonify({'message': 'Mind map deleted'}), 200
@@ -422,6 +751,7 @@ def delete_mindmap(map_id):
 # ==================== Pomodoro Stats ====================
 @study_bp.route('/pomodoro/stats', methods=['GET'])
 @jwt_required()
+@conditional('pomodoro', daily=True)
 def get_pomodoro_stats():
     """Get pomodoro statistics"""
     try:
@@ -448,17 +778,136 @@ def update_pomodoro_stats():
         stats = PomodoroStats.query.filter_by(user_id=user_id, date=today).first()
         
         if not stats:
-            stats = PomodoroStats(user_id=user_id, date=today)
+            stats = PomodoroStats(user_id=user_id, date=today, sessions_completed=0, total_focus_time=0)
             db.session.add(stats)
+        before = (stats.sessions_completed or 0, stats.total_focus_time or 0)
         
         if 'sessions_completed' in data:
             stats.sessions_completed = data['sessions_completed']
         if 'total_focus_time' in data:
             stats.total_focus_time = data['total_focus_time']
         
+        track_pomodoro(user_id, {today: (
+            (stats.sessions_completed or 0) - before[0],
+            (stats.total_focus_time or 0) - before[1]
+        )})
+        touch(user_id, 'pomodoro', 'analytics')
         db.session.commit()
         
         return jsonify({'message': 'Stats updated', 'stats': stats.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+@study_bp.route('/pomodoro/stats/increment', methods=['POST'])
+@jwt_required()
+def increment_pomodoro_stats():
+    """Add completed sessions and focus time to the daily totals.
+    
+    Accepts one increment ({sessions_completed, total_focus_time, date?, id?}) or a
+    batch of offline events ({events: [...]}); each day is applied with a
+    single upsert, so concurrent tabs never lose updates. Events carrying an
+    `id` are applied once, however often they are resent.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        events = data['events'] if 'events' in data else [data]
+        if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+            return jsonify({'error': 'events must be a list of objects'}), 400
+        
+        event_ids = [str(event['id']) for event in events if event.get('id')]
+        if any(len(event_id) > 64 for event_id in event_ids):
+            return jsonify({'error': 'Event ids must be at most 64 characters'}), 400
+        fresh = claim_events(user_id, event_ids)
+        prune_events(current_app.config['POMODORO_EVENT_RETENTION'], current_app.config['POMODORO_EVENT_PRUNE_INTERVAL'])
+        
+        totals, duplicates = {}, 0
+        for event in events:
+            if event.get('id'):
+                if str(event['id']) not in fresh:
+                    duplicates += 1
+                    continue
+                fresh.discard(str(event['id']))
+            day = date.fromisoformat(event['date']) if event.get('date') else date.today()
+            sessions = int(event.get('sessions_completed', 0))
+            focus_time = int(event.get('total_focus_time', 0))
+            if sessions < 0 or focus_time < 0:
+                return jsonify({'error': 'Increments must not be negative'}), 400
+            current = totals.setdefault(day, [0, 0])
+            current[0] += sessions
+            current[1] += focus_time
+        
+        if totals:
+            increment_rows(PomodoroStats, ('user_id', 'date'), [
+                {'user_id': user_id, 'date': day, 'sessions_completed': sessions, 'total_focus_time': focus_time}
+                for day, (sessions, focus_time) in totals.items()
+            ])
+            track_pomodoro(user_id, totals)
+            touch(user_id, 'pomodoro', 'analytics')
+        db.session.commit()
+        
+        stats = PomodoroStats.query.filter_by(user_id=user_id, date=date.today()).first()
+        today = stats.to_dict() if stats else {'sessions_completed': 0, 'total_focus_time': 0}
+        return jsonify({
+            'message': 'Stats updated',
+            'days_updated': len(totals),
+            'duplicates': duplicates,
+            'stats': today
+        }), 200
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Invalid event: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# ==================== Analytics ====================
+@study_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+@conditional('analytics', daily=True)
+def get_analytics():
+    """Focus time, sessions, quiz accuracy and streaks for the last ?days= days (default 30)"""
+    try:
+        user_id = get_jwt_identity()
+        days = request.args.get('days', 30, type=int)
+        if not 1 <= days <= MAX_DAYS:
+            return jsonify({'error': f'days must be between 1 and {MAX_DAYS}'}), 400
+        
+        return jsonify(summary(user_id, days)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ==================== Search ====================
+@study_bp.route('/search', methods=['GET'])
+@jwt_required()
+@conditional('notes', 'flashcards', 'quizzes')
+def search_items():
+    """Ranked full-text search over the user's notes, flashcards and quizzes"""
+    try:
+        if not search.available():
+            return jsonify({'error': 'Search requires SQLite with FTS5'}), 501
+        
+        user_id = get_jwt_identity()
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('type')
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        if kind and kind not in search.KINDS:
+            return jsonify({'error': f"type must be one of: {', '.join(search.KINDS)}"}), 400
+        
+        limit = parse_limit()
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        
+        hits, last = search.search(user_id, query, kind, limit, after)
+        return jsonify({
+            'results': hits,
+            'next_cursor': encode_cursor(*last) if last else None
+        }), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,133 @@
+from flask import Blueprint, Request, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Document, Upload
+from extraction import save_stream, extraction_queue
+from datetime import datetime, timedelta
+import os
+import tempfile
+
+uploads_bp = Blueprint('uploads', __name__)
+
+def upload_folder():
+    folder = current_app.config['UPLOAD_FOLDER']
+    return folder if os.path.isabs(folder) else os.path.join(current_app.root_path, folder)
+
+class UploadRequest(Request):
+    """Spools multipart files into the upload folder, so storing one is a hard link, not a copy"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        folder = upload_folder()
+        os.makedirs(folder, exist_ok=True)
+        # Deleted when the request closes its files
+        return tempfile.NamedTemporaryFile(dir=folder, prefix='.upload-', suffix='.part')
+
+def document_path(document):
+    return os.path.join(upload_folder(), f'{document.content_hash}.{document.extension}')
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+def requeue_lost(document):
+    """Queue extraction again for a document pending longer than UPLOAD_EXTRACT_TIMEOUT.
+    
+    Its extraction was lost to a restart or a dead worker process. The
+    conditional update lets only one request requeue it.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['UPLOAD_EXTRACT_TIMEOUT'])
+    if document.status != 'pending' or (document.queued_at and document.queued_at >= cutoff):
+        return
+    claimed = db.session.execute(
+        update(Document)
+        .where(Document.id == document.id, Document.status == 'pending',
+               or_(Document.queued_at.is_(None), Document.queued_at < cutoff))
+        .values(queued_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if claimed:
+        extraction_queue.submit(document.id, document_path(document), document.extension)
+
+def get_or_create_document(content_hash, path, extension, size):
+    """Return the Document for this content, queueing extraction if it is new, failed or lost"""
+    document = Document.query.filter_by(content_hash=content_hash).first()
+    
+    if not document:
+        document = Document(content_hash=content_hash, extension=extension, size=size, queued_at=datetime.utcnow())
+        db.session.add(document)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The same file was uploaded concurrently; use the other request's row
+            db.session.rollback()
+            return Document.query.filter_by(content_hash=content_hash).first()
+    elif document.status == 'failed':
+        document.status = 'pending'
+        document.error = None
+        document.queued_at = datetime.utcnow()
+        db.session.commit()
+    else:
+        requeue_lost(document)
+        return document
+    
+    extraction_queue.submit(document.id, path, extension)
+    return document
+
+@uploads_bp.route('', methods=['POST'])
+@jwt_required()
+def upload_file():
+    """Upload a study file (multipart field `file`); text is extracted in the background"""
+    try:
+        user_id = get_jwt_identity()
+        file = request.files.get('file')
+        
+        if not file or not file.filename:
+            return jsonify({'error': 'File is required'}), 400
+        
+        filename = secure_filename(file.filename)
+        extension = file_extension(filename)
+        if extension not in current_app.config['ALLOWED_EXTENSIONS']:
+            return jsonify({'error': 'File type not allowed'}), 400
+        
+        content_hash, path, size = save_stream(file.stream, upload_folder(), extension)
+        document = get_or_create_document(content_hash, path, extension, size)
+        
+        upload = Upload(user_id=user_id, document_id=document.id, filename=filename)
+        db.session.add(upload)
+        db.session.commit()
+        
+        status = 200 if document.status == 'ready' else 202
+        return jsonify({'message': 'File uploaded', 'upload': upload.to_dict()}), status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@uploads_bp.route('/<int:upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(upload_id):
+    """Get upload status; include_text=true returns the extracted text once ready"""
+    try:
+        user_id = get_jwt_identity()
+        upload = Upload.query.filter_by(id=upload_id, user_id=user_id).first()
+        
+        if not upload:
+            return jsonify({'error': 'Upload not found'}), 404
+        
+        requeue_lost(upload.document)
+        data = upload.to_dict()
+        if request.args.get('include_text') == 'true' and upload.document.status == 'ready':
+            data['text'] = upload.document.text
+        
+        return jsonify({'upload': data}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def uploaded_text(user_id, upload_id):
+    """Return (text, None) for a ready upload, or (None, error response)"""
+    upload = Upload.query.filter_by(id=upload_id, user_id=user_id).first()
+    if not upload:
+        return None, (jsonify({'error': 'Upload not found'}), 404)
+    if upload.document.status != 'ready':
+        return None, (jsonify({'error': f'Upload is {upload.document.status}'}), 409)
+    return upload.document.text, None
@@ -0,0 +1,80 @@
+from sqlalchemy import func
+from datetime import datetime, timedelta
+from models import db, Flashcard, FlashcardDeck
+
+MIN_EASE_FACTOR = 1.3
+DEFAULT_EASE_FACTOR = 2.5
+PASSING_QUALITY = 3
+MAX_RETRIES = 3
+
+def next_interval(ease_factor, interval, quality):
+    """SM-2 step: return (ease_factor, interval_days) after a review.
+    
+    quality is the 0-5 recall grade. The repetition number SM-2 needs is
+    inferred from the current interval (0 = new, 1 = after first pass or a
+    lapse), so cards only have to store the ease factor and interval.
+    """
+    ease_factor = ease_factor or DEFAULT_EASE_FACTOR
+    interval = interval or 0
+    
+    if quality < PASSING_QUALITY:
+        interval = 1
+    elif interval == 0:
+        interval = 1
+    elif interval == 1:
+        interval = 6
+    else:
+        interval = round(interval * ease_factor)
+    
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return max(ease_factor, MIN_EASE_FACTOR), interval
+
+def parse_quality(data):
+    """Read a 0-5 grade from a review payload; a bare correct flag maps to 4 or 1"""
+    if 'quality' in data:
+        quality = int(data['quality'])
+        if not 0 <= quality <= 5:
+            raise ValueError('quality must be between 0 and 5')
+        return quality
+    if 'correct' in data:
+        return 4 if data['correct'] else 1
+    raise ValueError('quality or correct is required')
+
+def record_review(card_id, quality, now=None):
+    """Apply one review to a card and return the refreshed card.
+    
+    The new schedule is written with a compare-and-set on review_count, so two
+    concurrent reviews of the same card cannot both apply to the same state;
+    the loser re-reads and reschedules from the winner's result.
+    """
+    now = now or datetime.utcnow()
+    
+    for _ in range(MAX_RETRIES):
+        card = db.session.get(Flashcard, card_id, populate_existing=True)
+        ease_factor, interval = next_interval(card.ease_factor, card.interval, quality)
+        
+        updated = Flashcard.query.filter(
+            Flashcard.id == card_id,
+            func.coalesce(Flashcard.review_count, 0) == (card.review_count or 0)
+        ).update({
+            'ease_factor': ease_factor,
+            'interval': interval,
+            'last_reviewed': now,
+            'next_review': now + timedelta(days=interval),
+            'review_count': func.coalesce(Flashcard.review_count, 0) + 1,
+            'correct_count': func.coalesce(Flashcard.correct_count, 0) + (1 if quality >= PASSING_QUALITY else 0)
+        }, synchronize_session=False)
+        db.session.commit()
+        
+        if updated:
+            return db.session.get(Flashcard, card_id, populate_existing=True)
+    
+    raise RuntimeError('Card is being reviewed concurrently, try again')
+
+def due_cards(user_id, limit, now=None):
+    """Return up to limit of the user's cards that are due, most overdue first"""
+    now = now or datetime.utcnow()
+    return Flashcard.query.join(FlashcardDeck).filter(
+        FlashcardDeck.user_id == user_id,
+        Flashcard.next_review <= now
+    ).order_by(Flashcard.next_review.asc(), Flashcard.id.asc()).limit(limit).all()
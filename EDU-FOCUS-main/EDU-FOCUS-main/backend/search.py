@@ -0,0 +1,216 @@
+"""Full-text search over notes, flashcards and quizzes with SQLite FTS5.
+
+One FTS5 table holds a row per searchable item. Triggers on the source
+tables keep it in sync, so ORM writes and the executemany bulk imports are
+indexed alike.
+
+Row ids are (user_id << 32) + item id * 4 + kind. A user's rows therefore
+form one rowid range, which FTS5 applies while walking the postings, and the
+triggers can replace an item's entry with a rowid lookup. Only the newest
+SEARCH_CANDIDATES matches of each kind are ranked, which keeps very common
+terms from scoring every document the user has. The window is taken per kind
+because item ids of different tables are not comparable: a user with many
+flashcards would otherwise push every note out of it. Prefix indexes keep short
+search-as-you-type prefixes from expanding into thousands of terms.
+"""
+import re
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import db
+
+KINDS = {'note': 1, 'flashcard': 2, 'quiz': 3}
+
+# Column weights for bm25(): title, body, tags. Title hits outrank body hits.
+RANK = 'bm25(search_index, 10.0, 1.0, 5.0)'
+
+CREATE_TABLE = """
+    CREATE VIRTUAL TABLE search_index USING fts5(
+        title, body, tags,
+        kind UNINDEXED, item_id UNINDEXED, parent_id UNINDEXED,
+        tokenize = 'porter unicode61', prefix = '2 3'
+    )
+"""
+
+QUIZ_QUESTIONS = "(SELECT group_concat(question, ' ') FROM quiz_questions WHERE quiz_id = {row}.id)"
+
+# table: (kind, columns whose updates re-index, owner expression, indexed
+# values, (owner table, join condition) when the owner lives elsewhere)
+SOURCES = {
+    'notes': (
+        KINDS['note'], 'user_id, title, content, tags', '{row}.user_id',
+        "{row}.title, {row}.content, replace({row}.tags, ',', ' '), 'note', {row}.id, NULL",
+        None
+    ),
+    'flashcards': (
+        KINDS['flashcard'], 'deck_id, question, answer', 'decks.user_id',
+        "{row}.question, {row}.answer, NULL, 'flashcard', {row}.id, {row}.deck_id",
+        ('flashcard_decks AS decks', 'decks.id = {row}.deck_id')
+    ),
+    'quizzes': (
+        KINDS['quiz'], 'user_id, title, topic', '{row}.user_id',
+        "{row}.title, " + QUIZ_QUESTIONS + ", {row}.topic, 'quiz', {row}.id, NULL",
+        None
+    ),
+}
+
+# Tables whose rows are indexed as part of a parent item:
+# table: (parent table, foreign key, columns whose updates re-index)
+CHILDREN = {
+    'quiz_questions': ('quizzes', 'quiz_id', 'quiz_id, question'),
+}
+
+COLUMNS = 'rowid, title, body, tags, kind, item_id, parent_id'
+
+def _rowid(owner, kind):
+    return f'({owner} << 32) + {{row}}.id * 4 + {kind}'
+
+def _triggers(table, kind, indexed, owner, values, join):
+    rowid = _rowid(owner, kind)
+    source = f' FROM {join[0]} WHERE {join[1]}' if join else ''
+    insert = f"INSERT INTO search_index ({COLUMNS}) SELECT {rowid}, {values}{source};".format(row='NEW')
+    delete = f"DELETE FROM search_index WHERE rowid = (SELECT {rowid}{source});".format(row='OLD')
+    return [
+        f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {indexed} ON {table} BEGIN {delete} {insert} END",
+        f"CREATE TRIGGER {table}_search_delete BEFORE DELETE ON {table} BEGIN {delete} END",
+    ]
+
+def _child_triggers(table, parent, key, indexed):
+    """Re-index the parent item whenever one of its child rows changes"""
+    kind, _, owner, values, join = SOURCES[parent]
+    rowid = _rowid(owner, kind)
+    source = f' JOIN {join[0]} ON {join[1]}' if join else ''
+
+    def refresh(row):
+        where = f'{parent}.id = {row}.{key}'
+        return (
+            f"DELETE FROM search_index WHERE rowid = (SELECT {rowid} FROM {parent}{source} WHERE {where}); "
+            f"INSERT INTO search_index ({COLUMNS}) SELECT {rowid}, {values} FROM {parent}{source} WHERE {where};"
+        ).format(row=parent)
+
+    return [
+        f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {refresh('NEW')} END",
+        f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF {indexed} ON {table} "
+        f"BEGIN {refresh('OLD')} {refresh('NEW')} END",
+        f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN {refresh('OLD')} END",
+    ]
+
+def install():
+    """Create the index and its triggers; fill the index when it is first created.
+
+    Triggers are recreated on every start so their definitions follow this
+    module. Update triggers fire only for the indexed columns, so flashcard
+    reviews and quiz submissions don't re-index. Returns False when the
+    database has no FTS5 support.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    created = False
+    exists = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first()
+    if not exists:
+        try:
+            db.session.execute(text(CREATE_TABLE))
+        except OperationalError:
+            db.session.rollback()
+            return False
+        created = True
+
+    triggers = {table: _triggers(table, *source) for table, source in SOURCES.items()}
+    triggers.update({table: _child_triggers(table, *child) for table, child in CHILDREN.items()})
+    for table, statements in triggers.items():
+        for event in ('insert', 'update', 'delete'):
+            db.session.execute(text(f'DROP TRIGGER IF EXISTS {table}_search_{event}'))
+        for statement in statements:
+            db.session.execute(text(statement))
+
+    if created:
+        rebuild()
+    db.session.commit()
+    return True
+
+def available():
+    """Whether install() has set up the index for this database"""
+    return db.engine.dialect.name == 'sqlite' and bool(db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+    )).first())
+
+def rebuild():
+    """Re-index every note, flashcard and quiz"""
+    db.session.execute(text('DELETE FROM search_index'))
+    for table, (kind, _, owner, values, join) in SOURCES.items():
+        source = f'{table} JOIN {join[0]} ON {join[1]}' if join else table
+        db.session.execute(text(
+            f"INSERT INTO search_index ({COLUMNS}) SELECT {_rowid(owner, kind)}, {values} FROM {source}".format(row=table)
+        ))
+
+def match_expression(query):
+    """Turn free text into an FTS5 query.
+
+    Terms are quoted so user input can't inject FTS5 syntax; the last term
+    is a prefix match to support search-as-you-type. Returns None when the
+    query has no searchable terms.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+def search(user_id, query, kind=None, limit=20, after=None):
+    """Return up to `limit` ranked hits and the (score, rowid) key of the last one.
+
+    `after` is the key of the last hit on the previous page; hits with the
+    same score are ordered by rowid so paging is stable.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], None
+
+    user_id = int(user_id)
+    matches = 'search_index MATCH :expression AND rowid BETWEEN :low AND :high'
+    params = {
+        'expression': expression,
+        'low': user_id << 32,
+        'high': ((user_id + 1) << 32) - 1,
+        'candidates': current_app.config['SEARCH_CANDIDATES'],
+        'limit': limit + 1
+    }
+    if kind:
+        matches += ' AND kind = :kind'
+        params['kind'] = kind
+
+    # The low two bits of a rowid are its kind, so the per-kind windows need no column reads
+    windows = ' OR '.join(f"""((rowid & 3) = {number} AND rowid >= (
+        SELECT COALESCE(MIN(rowid), 0) FROM (
+            SELECT rowid FROM search_index WHERE {matches} AND (rowid & 3) = {number}
+            ORDER BY rowid DESC LIMIT :candidates
+        )
+    ))""" for name, number in KINDS.items() if not kind or name == kind)
+    clauses = [matches, f'({windows})']
+    if after:
+        clauses.append(f'({RANK} > :score OR ({RANK} = :score AND rowid > :rowid))')
+        params['score'], params['rowid'] = after
+
+    rows = db.session.execute(text(f"""
+        SELECT rowid, kind, item_id, parent_id,
+               highlight(search_index, 0, '<mark>', '</mark>') AS title,
+               snippet(search_index, 1, '<mark>', '</mark>', '…', 16) AS snippet,
+               {RANK} AS score
+        FROM search_index
+        WHERE {' AND '.join(clauses)}
+        ORDER BY score, rowid
+        LIMIT :limit
+    """), params).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    hits = []
+    for row in rows:
+        hit = {'type': row.kind, 'id': row.item_id, 'title': row.title, 'snippet': row.snippet, 'score': row.score}
+        if row.kind == 'flashcard':
+            hit['deck_id'] = row.parent_id
+        hits.append(hit)
+    return hits, ((rows[-1].score, rows[-1].rowid) if has_more else None)
@@ -0,0 +1,163 @@
+"""Near-duplicate cache for AI prompts.
+
+"Photosynthesis", "photosynthesis basics" and "explain photosynthesis" ask for
+the same study guide. Each request's key text is embedded locally as a hashed
+vector of character trigrams and words (filler words such as "explain" or
+"basics" dropped) and compared by cosine similarity with the entries stored
+under the same namespace. A match at or above SEMANTIC_CACHE_THRESHOLD
+reuses that entry's response. Terms that a trigram cannot tell apart must
+match exactly: numbers, so "World War 1" never answers for "World War 2",
+and short or symbol-bearing terms, so "C", "C++" and "C#" stay distinct.
+
+Entries live in a bounded in-process LRU. With NumPy the vectors sit in one
+preallocated matrix and a lookup is a single matrix-vector product; without
+it, lookups fall back to sparse dot products in Python.
+"""
+from collections import OrderedDict
+import math
+import re
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # optional; the pure-Python path gives the same results, slower
+    np = None
+
+DIMENSIONS = 1024
+WORD = re.compile(r'[\w+#]+')  # keeps "c++" and "c#" whole
+FILLER = frozenset('''
+    a an and the of on in to for about with into is are what how why explain explained explaining
+    basics basic intro introduction overview summary guide study notes understanding understand
+    learn learning beginner beginners simple simply please me tell give help
+'''.split())
+
+def stem(word):
+    # Plural "s" only: enough for "water cycles" to equal "water cycle"
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+def key_terms(text):
+    """Lowercased, singular words of text without filler; all words if nothing else is left"""
+    words = WORD.findall(text.lower())
+    return [stem(word) for word in words if word not in FILLER] or [stem(word) for word in words]
+
+def embed(text):
+    """Sparse unit vector {dimension: weight} of hashed word and trigram features"""
+    vector = {}
+    for word in key_terms(text):
+        padded = f'^{word}$'
+        features = [f'w:{word}'] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            digest = zlib.crc32(feature.encode('utf-8'))
+            index = digest % DIMENSIONS
+            vector[index] = vector.get(index, 0.0) + (1.0 if digest & 0x80000000 else -1.0)
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {index: weight / norm for index, weight in vector.items() if weight} if norm else {}
+
+def exact_terms(text):
+    """Key terms that must match exactly: short ones and any with digits or symbols"""
+    return frozenset(word for word in key_terms(text) if len(word) <= 2 or not word.isalpha())
+
+class SemanticCache:
+    """Bounded LRU of responses looked up by similarity of their key text"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (namespace, normalized text) -> [slot, vector, exact terms, response, created_at]
+        self.stats = {'hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config['SEMANTIC_CACHE_ENABLED']
+        self.threshold = app.config['SEMANTIC_CACHE_THRESHOLD']
+        self.capacity = app.config['SEMANTIC_CACHE_ENTRIES']
+        ttl = app.config['AI_CACHE_TTL']
+        self.ttl = ttl.total_seconds() if hasattr(ttl, 'total_seconds') else ttl
+        with self._lock:
+            self._entries.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+            self._free = list(range(self.capacity))
+            self._matrix = np.zeros((self.capacity, DIMENSIONS), dtype=np.float32) if np is not None else None
+        app.extensions['semantic_cache'] = self
+
+    def _best(self, namespace, vector, wanted_terms, now):
+        # Caller holds self._lock; returns (key, similarity) of the closest live entry
+        if self._matrix is not None:
+            query = np.zeros(DIMENSIONS, dtype=np.float32)
+            query[list(vector)] = list(vector.values())
+            scores = self._matrix @ query
+            by_slot = {entry[0]: key for key, entry in self._entries.items() if key[0] == namespace}
+            for slot in sorted(by_slot, key=lambda slot: -scores[slot]):
+                entry = self._entries[by_slot[slot]]
+                if entry[2] == wanted_terms and now - entry[4] < self.ttl:
+                    return by_slot[slot], float(scores[slot])
+            return None, -1.0
+
+        best, best_score = None, -1.0
+        for key, entry in self._entries.items():
+            if key[0] != namespace or entry[2] != wanted_terms or now - entry[4] >= self.ttl:
+                continue
+            stored = entry[1]
+            score = sum(weight * stored.get(index, 0.0) for index, weight in vector.items())
+            if score > best_score:
+                best, best_score = key, score
+        return best, best_score
+
+    def get(self, namespace, text):
+        """Return the response stored for text or a near-duplicate of it, or None"""
+        if not self.enabled:
+            return None
+        normalized = ' '.join(key_terms(text))
+        vector = embed(text)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((namespace, normalized))
+            if entry and now - entry[4] < self.ttl:
+                key, score = (namespace, normalized), 1.0
+            elif vector:
+                key, score = self._best(namespace, vector, exact_terms(text), now)
+            else:
+                key, score = None, -1.0
+
+            if key is None or score < self.threshold:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits' if key[1] == normalized else 'near_hits'] += 1
+            return self._entries[key][3]
+
+    def set(self, namespace, text, response):
+        """Store a response under text, evicting the least recently used entry when full"""
+        if not self.enabled or not response:
+            return
+        key = (namespace, ' '.join(key_terms(text)))
+        vector = embed(text)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                slot = entry[0]
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                _, evicted = self._entries.popitem(last=False)
+                slot = evicted[0]
+                self.stats['evictions'] += 1
+
+            if self._matrix is not None:
+                self._matrix[slot] = 0.0
+                if vector:
+                    self._matrix[slot, list(vector)] = list(vector.values())
+            self._entries[key] = [slot, vector, exact_terms(text), response, time.time()]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), capacity=self.capacity,
+                         backend='numpy' if self._matrix is not None else 'python')
+        lookups = stats['hits'] + stats['near_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['near_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+semantic_cache = SemanticCache()
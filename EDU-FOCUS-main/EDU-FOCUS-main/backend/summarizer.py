@@ -0,0 +1,64 @@
+from ai_streaming import estimate_tokens
+import hashlib
+import re
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+MAX_LEVELS = 5
+
+def _pieces(text, max_tokens):
+    """Yield paragraphs, splitting any that exceed max_tokens on sentence
+    boundaries and, failing that, at a fixed character width."""
+    max_chars = max_tokens * 4
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            yield paragraph
+            continue
+        for sentence in SENTENCE_END.split(paragraph):
+            for start in range(0, len(sentence), max_chars):
+                yield sentence[start:start + max_chars]
+
+def _is_boundary(piece):
+    digest = hashlib.blake2b(piece.encode('utf-8'), digest_size=2).digest()
+    return digest[0] % 4 == 0
+
+def chunk_text(text, max_tokens):
+    """Yield chunks of at most max_tokens, cut on paragraph/sentence boundaries.
+    
+    Once a chunk is half full it is closed after any piece whose hash hits a
+    boundary marker. Cut points therefore depend on content, not offsets, so an
+    edit only changes the chunks around it and the rest keep their cache keys.
+    """
+    chunk, size = [], 0
+    for piece in _pieces(text, max_tokens):
+        tokens = estimate_tokens(piece)
+        if chunk and size + tokens > max_tokens:
+            yield '\n\n'.join(chunk)
+            chunk, size = [], 0
+        chunk.append(piece)
+        size += tokens
+        if size >= max_tokens // 2 and _is_boundary(piece):
+            yield '\n\n'.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield '\n\n'.join(chunk)
+
+def condense(text, summarize_all, max_tokens, instruction):
+    """Map-reduce text down to at most max_tokens.
+    
+    Each level chunks the current text, summarizes the chunks with
+    summarize_all(prompts) -> summaries (run in parallel by the caller), and
+    joins the partial summaries; levels repeat until the result fits.
+    """
+    for _ in range(MAX_LEVELS):
+        if estimate_tokens(text) <= max_tokens:
+            break
+        chunks = list(chunk_text(text, max_tokens))
+        prompts = [f"{instruction}\n\n{chunk}" for chunk in chunks]
+        text = '\n\n'.join(summarize_all(prompts))
+        if len(chunks) == 1:
+            break
+    return text
@@ -0,0 +1,74 @@
+"""Normalized note tags.
+
+Tags live in the tags / note_tags tables so filtering and facet counts are
+indexed lookups. Note.tags keeps a comma-separated copy, written together
+with the association, so serializing a page of notes needs no extra query.
+"""
+from sqlalchemy import false, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Note, Tag, note_tags
+
+def clean_tags(tags):
+    """Strip, drop empty and de-duplicate tags given as a list or a comma-separated string"""
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    cleaned = []
+    for tag in tags or []:
+        tag = str(tag).strip()
+        if tag and tag not in cleaned:
+            cleaned.append(tag)
+    return cleaned
+
+def set_note_tags(user_id, tags_by_note):
+    """Replace the tags of each note in {note_id: [names]} with one statement per step"""
+    if not tags_by_note:
+        return
+    user_id = int(user_id)
+    names = {name for tags in tags_by_note.values() for name in tags}
+    
+    if names:
+        dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+        db.session.execute(
+            dialect.insert(Tag.__table__).on_conflict_do_nothing(index_elements=['user_id', 'name']),
+            [{'user_id': user_id, 'name': name} for name in names]
+        )
+    tag_ids = dict(db.session.query(Tag.name, Tag.id).filter(Tag.user_id == user_id, Tag.name.in_(names))) if names else {}
+    
+    db.session.execute(note_tags.delete().where(note_tags.c.note_id.in_(list(tags_by_note))))
+    links = [
+        {'note_id': note_id, 'tag_id': tag_ids[name]}
+        for note_id, tags in tags_by_note.items() for name in tags
+    ]
+    if links:
+        db.session.execute(note_tags.insert(), links)
+
+def with_tag(query, user_id, name):
+    """Restrict a Note query to notes carrying the tag.
+    
+    The tag id is resolved first so the query is driven from the tag's
+    note_tags rows instead of probing note_tags for every note of the user.
+    """
+    tag_id = db.session.query(Tag.id).filter(Tag.user_id == user_id, Tag.name == name).scalar()
+    if tag_id is None:
+        return query.filter(false())
+    return query.filter(Note.id.in_(select(note_tags.c.note_id).where(note_tags.c.tag_id == tag_id)))
+
+def tag_counts(user_id):
+    """[{'name', 'count'}] for every tag on at least one of the user's notes, most used first"""
+    count = func.count(note_tags.c.note_id)
+    rows = db.session.query(Tag.name, count).join(
+        note_tags, note_tags.c.tag_id == Tag.id
+    ).filter(Tag.user_id == user_id).group_by(Tag.id, Tag.name).order_by(count.desc(), Tag.name)
+    return [{'name': name, 'count': total} for name, total in rows]
+
+def backfill(batch_size=1000):
+    """Build note_tags from the comma-separated Note.tags of every note"""
+    pending = {}
+    query = db.session.query(Note.id, Note.user_id, Note.tags).filter(Note.tags.isnot(None), Note.tags != '')
+    for note_id, user_id, tags in query.all():
+        pending.setdefault(user_id, {})[note_id] = clean_tags(tags)
+        if len(pending[user_id]) >= batch_size:
+            set_note_tags(user_id, pending.pop(user_id))
+    for user_id, tags_by_note in pending.items():
+        set_note_tags(user_id, tags_by_note)
+    db.session.commit()
@@ -0,0 +1,216 @@
+"""Token accounting and per-user daily quotas for the AI endpoints.
+
+Calls are recorded in memory and written by a background thread every
+AI_USAGE_FLUSH_INTERVAL seconds (or sooner once AI_USAGE_FLUSH_SIZE calls are
+buffered): one bulk insert into ai_usage and one upsert per (user, day,
+endpoint, model) into ai_usage_daily. Requests never write usage inline.
+
+Quotas are checked against an in-memory total per user and day. It is
+loaded from ai_usage_daily plus this process's unwritten calls, and reloaded
+after AI_USAGE_SYNC_INTERVAL seconds so usage from other workers counts too.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import atexit
+import logging
+import threading
+import time
+from sqlalchemy import func
+from ai_gateway import GatewayError
+from analytics import increment_rows
+from models import db, AIUsage, AIUsageDaily
+
+logger = logging.getLogger(__name__)
+
+class QuotaExceeded(GatewayError):
+    """The user has spent today's token quota"""
+
+def seconds_until_midnight(now=None):
+    now = now or datetime.utcnow()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((midnight - now).total_seconds()))
+
+class UsageLedger:
+    """Buffers per-call token counts and enforces AI_DAILY_TOKEN_QUOTA"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._totals = {}  # (user_id, day) -> [tokens, monotonic time of the last sync]
+        self._unflushed = defaultdict(int)  # (user_id, day) -> tokens in the buffer
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {'recorded': 0, 'written': 0, 'flushes': 0, 'flush_errors': 0, 'over_quota': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.quota = app.config['AI_DAILY_TOKEN_QUOTA']
+        self.flush_interval = app.config['AI_USAGE_FLUSH_INTERVAL']
+        self.flush_size = app.config['AI_USAGE_FLUSH_SIZE']
+        self.sync_interval = app.config['AI_USAGE_SYNC_INTERVAL']
+        app.extensions['usage_ledger'] = self
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='usage-ledger', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def record(self, user_id, endpoint, model, prompt_tokens, completion_tokens):
+        """Count one upstream call; it is written with the next flush"""
+        now = datetime.utcnow()
+        key = (int(user_id), now.date())
+        tokens = (prompt_tokens or 0) + (completion_tokens or 0)
+        with self._lock:
+            self._buffer.append({
+                'user_id': key[0],
+                'endpoint': endpoint,
+                'model': model,
+                'prompt_tokens': prompt_tokens or 0,
+                'completion_tokens': completion_tokens or 0,
+                'created_at': now
+            })
+            self._unflushed[key] += tokens
+            if key in self._totals:
+                self._totals[key][0] += tokens
+            self.stats['recorded'] += 1
+            full = len(self._buffer) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def used_today(self, user_id):
+        """Tokens the user has spent today, across all workers as of the last sync"""
+        key = (int(user_id), datetime.utcnow().date())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._totals.get(key)
+            if entry and now - entry[1] < self.sync_interval:
+                return entry[0]
+
+        stored = db.session.query(
+            func.coalesce(func.sum(AIUsageDaily.prompt_tokens + AIUsageDaily.completion_tokens), 0)
+        ).filter(AIUsageDaily.user_id == key[0], AIUsageDaily.day == key[1]).scalar()
+        with self._lock:
+            total = int(stored) + self._unflushed.get(key, 0)
+            self._totals[key] = [total, now]
+        return total
+
+    def check(self, user_id):
+        """Raise QuotaExceeded (429 until midnight UTC) once today's quota is spent"""
+        if self.quota is None or self.used_today(user_id) < self.quota:
+            return
+        with self._lock:
+            self.stats['over_quota'] += 1
+        raise QuotaExceeded('Daily AI token quota reached', 429, seconds_until_midnight())
+
+    def flush(self):
+        """Write buffered calls; returns how many were written"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows or self.app is None:
+            return 0
+
+        rollup = {}
+        written = defaultdict(int)
+        for row in rows:
+            day = row['created_at'].date()
+            key = (row['user_id'], day, row['endpoint'], row['model'])
+            totals = rollup.setdefault(key, {
+                'user_id': row['user_id'], 'day': day, 'endpoint': row['endpoint'], 'model': row['model'],
+                'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0
+            })
+            totals['calls'] += 1
+            totals['prompt_tokens'] += row['prompt_tokens']
+            totals['completion_tokens'] += row['completion_tokens']
+            written[(row['user_id'], day)] += row['prompt_tokens'] + row['completion_tokens']
+
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(AIUsage), rows)
+                increment_rows(AIUsageDaily, ('user_id', 'day', 'endpoint', 'model'), list(rollup.values()))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Writing %d AI usage rows failed; will retry', len(rows))
+                with self._lock:
+                    self._buffer[:0] = rows
+                    self.stats['flush_errors'] += 1
+                return 0
+
+        today = datetime.utcnow().date()
+        with self._lock:
+            for key, tokens in written.items():
+                self._unflushed[key] -= tokens
+                if self._unflushed[key] <= 0:
+                    del self._unflushed[key]
+            for key in [key for key in self._totals if key[1] != today]:
+                del self._totals[key]
+            self.stats['written'] += len(rows)
+            self.stats['flushes'] += 1
+        return len(rows)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('AI usage flush failed')
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, buffered=len(self._buffer), quota=self.quota)
+
+class MeteredBackend:
+    """An LLM backend whose completions are recorded against a user and endpoint"""
+
+    def __init__(self, backend, user_id, endpoint):
+        self.backend = backend
+        self.model = backend.model
+        self.user_id = user_id
+        self.endpoint = endpoint
+
+    def record(self, prompt_tokens, completion_tokens):
+        usage_ledger.record(self.user_id, self.endpoint, self.model, prompt_tokens, completion_tokens)
+
+    def complete(self, messages, max_tokens, temperature):
+        completion = self.backend.complete(messages, max_tokens, temperature)
+        self.record(completion.prompt_tokens, completion.completion_tokens)
+        return completion
+
+    def stream(self, messages, max_tokens, temperature):
+        # Streams report usage at the end; the caller records it
+        return self.backend.stream(messages, max_tokens, temperature)
+
+def usage_by_endpoint(since, user_id=None, prices=None):
+    """Token totals per endpoint and model from `since` (a date) on, with estimated cost"""
+    query = db.session.query(
+        AIUsageDaily.endpoint,
+        AIUsageDaily.model,
+        func.sum(AIUsageDaily.calls),
+        func.sum(AIUsageDaily.prompt_tokens),
+        func.sum(AIUsageDaily.completion_tokens)
+    ).filter(AIUsageDaily.day >= since)
+    if user_id is not None:
+        query = query.filter(AIUsageDaily.user_id == int(user_id))
+
+    prices = prices or {}
+    results = []
+    rows = query.group_by(AIUsageDaily.endpoint, AIUsageDaily.model)
+    for endpoint, model, calls, prompt_tokens, completion_tokens in rows:
+        prompt_price, completion_price = prices.get(model, (0, 0))
+        results.append({
+            'endpoint': endpoint,
+            'model': model,
+            'calls': calls,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'cost': round((prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000, 6)
+        })
+    results.sort(key=lambda row: row['total_tokens'], reverse=True)
+    return results
+
+usage_ledger = UsageLedger()
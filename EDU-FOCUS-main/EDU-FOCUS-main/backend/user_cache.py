@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from models import db, User, SerializerMixin
+import threading
+import time
+
+class UserRecord(SerializerMixin):
+    """Read-only snapshot of a user's public columns, safe to share across requests"""
+    FIELDS = User.FIELDS
+    
+    def __init__(self, row):
+        for name, (attr, _) in self.FIELDS.items():
+            setattr(self, attr, getattr(row, attr))
+
+class UserCache:
+    """TTL + LRU cache of UserRecords for JWT-authenticated requests.
+    
+    Entries are dropped explicitly when a user's profile, password or login
+    time changes. Each process has its own cache, so a change made in another
+    worker becomes visible after at most USER_CACHE_TTL seconds.
+    """
+    
+    def __init__(self, app=None):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config['USER_CACHE_TTL']
+        self.max_entries = app.config['USER_CACHE_SIZE']
+        app.extensions['user_cache'] = self
+    
+    def get(self, user_id):
+        """Return the UserRecord for user_id, or None if the user does not exist"""
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        
+        columns = [getattr(User, attr) for attr, _ in User.FIELDS.values()]
+        row = db.session.query(*columns).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        
+        record = UserRecord(row)
+        with self._lock:
+            self._entries[user_id] = (record, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return record
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+
+user_cache = UserCache()
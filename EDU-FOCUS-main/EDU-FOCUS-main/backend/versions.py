@@ -0,0 +1,71 @@
+"""Per-user collection versions and conditional GETs.
+
+Write routes call touch() in the transaction that changes a collection. GET
+routes wrapped in conditional() build a weak ETag from the versions of the
+collections they read, so a client whose If-None-Match still matches gets a
+304 after one primary-key lookup, before any rows are loaded or serialized.
+Responses carry Cache-Control: private, no-cache, which makes browsers store
+them and revalidate on every fetch.
+"""
+from datetime import date, datetime
+from functools import wraps
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, CollectionVersion
+
+def touch(user_id, *collections):
+    """Bump the user's version of each collection; call before the write commits"""
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    table = CollectionVersion.__table__
+    stmt = dialect.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.collection],
+        set_={'version': table.c.version + 1, 'updated_at': stmt.excluded.updated_at}
+    )
+    now = datetime.utcnow()
+    db.session.execute(stmt, [
+        {'user_id': int(user_id), 'collection': name, 'version': 1, 'updated_at': now}
+        for name in collections
+    ])
+
+def current(user_id, collections):
+    """Return the ETag and last change time of the user's collections"""
+    rows = {row.collection: row for row in CollectionVersion.query.filter(
+        CollectionVersion.user_id == int(user_id),
+        CollectionVersion.collection.in_(collections)
+    )}
+    parts = [str(int(user_id))]
+    for name in collections:
+        parts.append(f'{name}{rows[name].version if name in rows else 0}')
+    changed = [row.updated_at for row in rows.values() if row.updated_at]
+    return '-'.join(parts), max(changed) if changed else None
+
+def conditional(*collections, daily=False):
+    """Answer a GET with 304 when the client's ETag is still current.
+
+    daily adds today's date to the ETag, for views whose output moves with
+    the calendar (today's stats, the last N days).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag, last_modified = current(get_jwt_identity(), collections)
+            if daily:
+                etag += f'-{date.today().isoformat()}'
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
@@ -24,6 +24,18 @@ class APIClient {
         return headers;
     }
 
+    // Append query parameters (e.g. limit, cursor, fields) to an endpoint
+    withQuery(endpoint, params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) {
+                query.append(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        });
+        const qs = query.toString();
+        return qs ? `${endpoint}?${qs}` : endpoint;
+    }
+
     // Generic API call
     async call(endpoint, method = 'GET', data = null, requiresAuth = true) {
         const config = {
@@ -31,7 +43,7 @@ class APIClient {
             headers: this.getHeaders(requiresAuth)
         };
 
-        if (data && (method === 'POST' || method === 'PUT')) {
+        if (data && (method === 'POST' || method === 'PUT' || method === 'PATCH')) {
             config.body = JSON.stringify(data);
         }
 
@@ -87,8 +99,8 @@ class APIClient {
     }
 
     // ==================== Study Sessions ====================
-    async getSessions() {
-        return await this.call('/study/sessions');
+    async getSessions(params = {}) {
+        return await this.call(this.withQuery('/study/sessions', params));
     }
 
     async createSession(sessionData) {
@@ -104,8 +116,8 @@ class APIClient {
     }
 
     // ==================== Flashcards ====================
-    async getFlashcardDecks() {
-        return await this.call('/study/flashcards/decks');
+    async getFlashcardDecks(params = {}) {
+        return await this.call(this.withQuery('/study/flashcards/decks', params));
     }
 
     async createDeck(name, description = '') {
@@ -119,6 +131,10 @@ class APIClient {
         return await this.call(`/study/flashcards/decks/${deckId}`, 'DELETE');
     }
 
+    async getDeckCards(deckId, params = {}) {
+        return await this.call(this.withQuery(`/study/flashcards/decks/${deckId}/cards`, params));
+    }
+
     async addCard(deckId, question, answer, difficulty = 'medium') {
         return await this.call(`/study/flashcards/decks/${deckId}/cards`, 'POST', {
             question,
@@ -127,13 +143,48 @@ class APIClient {
         });
     }
 
+    async reviewCard(cardId, quality) {
+        return await this.call(`/study/flashcards/cards/${cardId}/review`, 'POST', { quality });
+    }
+
+    async getDueCards(limit = 20) {
+        return await this.call(this.withQuery('/study/flashcards/due', { limit }));
+    }
+
     async deleteCard(cardId) {
         return await this.call(`/study/flashcards/cards/${cardId}`, 'DELETE');
     }
 
+    // ==================== Bulk Import / Export ====================
+    // body is NDJSON or CSV text, e.g. importRows('/study/notes/import', csvText, 'text/csv')
+    async importRows(endpoint, body, contentType = 'application/x-ndjson') {
+        const headers = { ...this.getHeaders(), 'Content-Type': contentType };
+        const response = await fetch(`${this.baseURL}${endpoint}`, { method: 'POST', headers, body });
+        const result = await response.json();
+
+        if (!response.ok) {
+            throw new Error(result.error || 'Import failed');
+        }
+        return result;
+    }
+
+    // Returns the parsed rows of an NDJSON export
+    async exportRows(endpoint) {
+        const response = await fetch(`${this.baseURL}${endpoint}`, { headers: this.getHeaders() });
+        if (!response.ok) {
+            throw new Error('Export failed');
+        }
+        const text = await response.text();
+        return text.split('\n').filter(Boolean).map(line => JSON.parse(line));
+    }
+
     // ==================== Notes ====================
-    async getNotes() {
-        return await this.call('/study/notes');
+    async getNotes(params = {}) {
+        return await this.call(this.withQuery('/study/notes', params));
+    }
+
+    async getNoteTags() {
+        return await this.call('/study/notes/tags');
     }
 
     async createNote(title, content, tags = []) {
@@ -157,8 +208,8 @@ class APIClient {
     }
 
     // ==================== Quizzes ====================
-    async getQuizzes() {
-        return await this.call('/study/quizzes');
+    async getQuizzes(params = {}) {
+        return await this.call(this.withQuery('/study/quizzes', params));
     }
 
     async createQuiz(title, topic, difficulty, questions) {
@@ -170,13 +221,21 @@ class APIClient {
         });
     }
 
+    async getQuiz(quizId) {
+        return await this.call(`/study/quizzes/${quizId}`);
+    }
+
+    async submitQuiz(quizId, score, answers = undefined) {
+        return await this.call(`/study/quizzes/${quizId}/submit`, 'POST', { score, answers });
+    }
+
     async deleteQuiz(quizId) {
         return await this.call(`/study/quizzes/${quizId}`, 'DELETE');
     }
 
     // ==================== Mind Maps ====================
-    async getMindMaps() {
-        return await this.call('/study/mindmaps');
+    async getMindMaps(params = {}) {
+        return await this.call(this.withQuery('/study/mindmaps', params));
     }
 
     async createMindMap(title, description, mapData) {
@@ -195,6 +254,11 @@ class APIClient {
         });
     }
 
+    // ops: [{op: 'add' | 'replace' | 'remove', path: '/nodes/<id>[/field]', value}]
+    async patchMindMap(mapId, version, ops) {
+        return await this.call(`/study/mindmaps/${mapId}`, 'PATCH', { version, ops });
+    }
+
     async deleteMindMap(mapId) {
         return await this.call(`/study/mindmaps/${mapId}`, 'DELETE');
     }
@@ -211,12 +275,111 @@ class APIClient {
         });
     }
 
+    async incrementPomodoroStats(events) {
+        return await this.call('/study/pomodoro/stats/increment', 'POST', { events });
+    }
+
+    // ==================== Analytics ====================
+    async getAnalytics(days = 30) {
+        return await this.call(this.withQuery('/study/analytics', { days }));
+    }
+
+    // ==================== Uploads ====================
+    async uploadFile(file) {
+        const form = new FormData();
+        form.append('file', file);
+
+        const headers = this.token ? { 'Authorization': `Bearer ${this.token}` } : {};
+        const response = await fetch(`${this.baseURL}/uploads`, { method: 'POST', headers, body: form });
+        const result = await response.json();
+
+        if (!response.ok) {
+            throw new Error(result.error || 'Upload failed');
+        }
+        return result;
+    }
+
+    async getUpload(uploadId, includeText = false) {
+        return await this.call(this.withQuery(`/uploads/${uploadId}`, includeText ? { include_text: 'true' } : {}));
+    }
+
     // ==================== AI Features ====================
-    async chatWithAI(message, conversationHistory = []) {
-        return await this.call('/ai/chat', 'POST', {
-            message,
-            history: conversationHistory
+    // Conversation context is kept server-side; only the new message is sent
+    async chatWithAI(message) {
+        return await this.call('/ai/chat', 'POST', { message });
+    }
+
+    async getChatHistory(params = {}) {
+        return await this.call(this.withQuery('/ai/chat/history', params));
+    }
+
+    async clearChatHistory() {
+        return await this.call('/ai/chat/history', 'DELETE');
+    }
+
+    // Stream a chat reply; onDelta receives each text fragment as it arrives.
+    // Resolves with { reply, usage } once the server sends the done event.
+    async chatWithAIStream(message, onDelta = () => {}) {
+        const response = await fetch(`${this.baseURL}/ai/chat`, {
+            method: 'POST',
+            headers: this.getHeaders(),
+            body: JSON.stringify({ message, stream: true })
+        });
+
+        if (!response.ok) {
+            const result = await response.json();
+            throw new Error(result.error || 'API request failed');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const raw of events) {
+                const lines = raw.split('\n');
+                const event = (lines.find(l => l.startsWith('event: ')) || 'event: message').slice(7);
+                const data = JSON.parse(lines.find(l => l.startsWith('data: ')).slice(6));
+
+                if (event === 'error') throw new Error(data.error);
+                if (event === 'done') return data;
+                onDelta(data.delta);
+            }
+        }
+        throw new Error('Stream ended before completion');
+    }
+
+    // Queue a request to an AI endpoint as a background job and poll until it finishes.
+    // Retries reuse the idempotency key, so a dropped connection never starts a second generation.
+    async runAIJob(endpoint, data, idempotencyKey = crypto.randomUUID()) {
+        const response = await fetch(`${this.baseURL}/ai/${endpoint}`, {
+            method: 'POST',
+            headers: { ...this.getHeaders(), 'Idempotency-Key': idempotencyKey },
+            body: JSON.stringify({ ...data, async: true })
         });
+        let { job, error } = await response.json();
+        if (!response.ok) {
+            throw new Error(error || 'API request failed');
+        }
+
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            ({ job } = await this.getAIJob(job.id));
+        }
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'AI job failed');
+        }
+        return job.result;
+    }
+
+    async getAIJob(jobId) {
+        return await this.call(`/ai/jobs/${jobId}`);
     }
 
     async summarizeVideo(title, transcript) {
@@ -246,6 +409,11 @@ class APIClient {
         });
     }
 
+    // source: { topic } | { content } | { upload_id }; target: { deck_id } | { deck_name }
+    async generateFlashcards(source, count = 10, target = {}) {
+        return await this.call('/ai/flashcards', 'POST', { ...source, ...target, count });
+    }
+
     async analyzeMaterial(content, question = '') {
         return await this.call('/ai/analyze-material', 'POST', {
             content,
@@ -16,6 +16,8 @@ class PomodoroTimer {
         this.setupListeners();
         this.updateDisplay();
         this.loadStats();
+        window.addEventListener('online', () => this.flushEvents());
+        this.flushEvents();
     }
 
     setupListeners() {
@@ -71,6 +73,7 @@ class PomodoroTimer {
         if (this.isWorkPhase) {
             this.sessionsCompleted++;
             this.totalFocusTime += this.workDuration;
+            this.queueEvent(this.workDuration);
             this.showNotification('Work session complete!', 'Take a break now');
             this.isWorkPhase = false;
             this.timeRemaining = this.breakDuration;
@@ -82,6 +85,7 @@ class PomodoroTimer {
 
         this.saveStats();
         this.updateDisplay();
+        this.flushEvents();
     }
 
     skipPhase() {
@@ -193,6 +197,62 @@ class PomodoroTimer {
         }
     }
 
+    loadPendingEvents() {
+        // Events older than 30 days are dropped, the rest capped to the newest 200
+        const cutoff = Date.now() - 30 * 24 * 60 * 60 * 1000;
+        const events = JSON.parse(localStorage.getItem('pomodoroPendingEvents') || '[]');
+        return events
+            .map(event => event.id ? event : { ...event, id: this.newEventId() })
+            .filter(event => new Date(event.date).getTime() >= cutoff)
+            .slice(-200);
+    }
+
+    newEventId() {
+        return window.crypto?.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
+
+    queueEvent(focusTime) {
+        // Completed sessions wait here until they reach the server; the id lets
+        // the server drop copies resent by another tab or after a lost response
+        const events = this.loadPendingEvents();
+        const now = new Date();
+        const day = `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}-${String(now.getDate()).padStart(2, '0')}`;
+        events.push({ id: this.newEventId(), date: day, sessions_completed: 1, total_focus_time: focusTime });
+        localStorage.setItem('pomodoroPendingEvents', JSON.stringify(events.slice(-200)));
+    }
+
+    async flushEvents() {
+        if (this.flushing || !navigator.onLine) return;
+        if (typeof api === 'undefined' || !api.token) return;
+
+        this.flushing = true;
+        try {
+            // One tab flushes at a time; the others skip instead of resending the same queue
+            if (navigator.locks) {
+                await navigator.locks.request('pomodoro-flush', { ifAvailable: true },
+                    lock => lock && this.sendPendingEvents());
+            } else {
+                await this.sendPendingEvents();
+            }
+        } catch (error) {
+            console.error('Failed to sync pomodoro stats:', error);
+        } finally {
+            this.flushing = false;
+        }
+    }
+
+    async sendPendingEvents() {
+        const events = this.loadPendingEvents();
+        localStorage.setItem('pomodoroPendingEvents', JSON.stringify(events));
+        if (events.length === 0) return;
+
+        await api.incrementPomodoroStats(events);
+        // Remove only what was sent; events queued meanwhile stay
+        const sent = new Set(events.map(event => event.id));
+        const pending = this.loadPendingEvents().filter(event => !sent.has(event.id));
+        localStorage.setItem('pomodoroPendingEvents', JSON.stringify(pending));
+    }
+
     saveSettings() {
         const settings = {
             workDuration: this.workDuration,